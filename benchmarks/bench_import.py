@@ -0,0 +1,62 @@
+"""Import-time budget for the dca_simulator modules, measured with python -X importtime in fresh interpreters.
+numpy/pandas are needed by everything, so the budget applies to what a module adds on top of them.
+It also fails when importing a module loads one of the heavy optional dependencies (they must be lazy).
+
+    python benchmarks/bench_import.py [--budget-ms 150] [--repeat 3]
+
+Exits with status 1 on a regression, so it can run in CI.
+"""
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODULES = ["dca_simulator.data_loader", "dca_simulator.strategies", "dca_simulator.metrics",
+           "dca_simulator.backtest", "dca_simulator.runner", "dca_simulator.cli", "dca_simulator.plots"]
+
+HEAVY = ["yfinance", "requests", "curl_cffi", "matplotlib", "numba", "panel", "bokeh", "holoviews", "hvplot"]
+
+
+def import_cost(statement, repeat):
+    """Best total import time (ms) of a statement over fresh interpreters, and the modules it left loaded"""
+
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                               f"{statement}; import sys, json; print(json.dumps(sorted(sys.modules)))"],
+                              cwd=ROOT, capture_output=True, text=True, check=True)
+        total_us = sum(int(line.split("|")[0].split(":")[1]) for line in proc.stderr.splitlines()
+                       if line.startswith("import time:") and "self [us]" not in line) #self times add up to the total
+        best = total_us if best is None else min(best, total_us)
+        loaded = json.loads(proc.stdout.splitlines()[-1])
+
+    return best/1000, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=150, help="allowed import time on top of numpy + pandas")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    baseline, _ = import_cost("import numpy, pandas", args.repeat)
+    print(f"numpy + pandas: {baseline:.0f} ms")
+
+    failed = False
+    for module in MODULES:
+        total, loaded = import_cost(f"import numpy, pandas, {module}", args.repeat)
+        extra = total - baseline
+        heavy = [name for name in HEAVY if name in loaded]
+
+        ok = extra <= args.budget_ms and not heavy
+        failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {module:28s} +{extra:6.0f} ms" + (f"  loads {', '.join(heavy)}" if heavy else ""))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
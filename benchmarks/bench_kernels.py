@@ -0,0 +1,42 @@
+"""Rolling max / SMA kernels vs one pandas rolling() pass per window, on the bundled AAPL series.
+Windows are the sma_period slider range of interface.py (10-300).
+
+    python benchmarks/bench_kernels.py
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from dca_simulator.kernels import rolling_max_many, sma_many
+
+AAPL_CSV = Path(__file__).resolve().parent.parent / "AAPL_2000_2025.csv"
+
+
+def best_of(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    close = pd.read_csv(AAPL_CSV, index_col="Date", parse_dates=True)["Close"].dropna()
+    windows = np.arange(10, 310, 10)
+
+    for name, kernel, method in [("rolling max", rolling_max_many, "max"), ("sma", sma_many, "mean")]:
+        t_pandas, expected = best_of(lambda: np.array([getattr(close.rolling(w), method)().to_numpy() for w in windows]))
+        t_kernel, got = best_of(lambda: kernel(close.to_numpy(), windows))
+
+        err = np.nanmax(np.abs(got - expected)/expected)
+        print(f"{name:12s} {len(windows)} windows x {len(close)} days: pandas {t_pandas*1000:7.2f} ms, "
+              f"kernel {t_kernel*1000:7.2f} ms, speedup {t_pandas/t_kernel:5.1f}x, max rel diff {err:.1e}")
+
+
+if __name__ == "__main__":
+    main()
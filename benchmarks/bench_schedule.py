@@ -0,0 +1,55 @@
+"""Runtime of every strategy with the daily schedule vs the default monthly one, on the full bundled AAPL series.
+The daily schedule has ~20x more purchases, the scheduler/engine should keep it within a small factor of the monthly run.
+Each run starts with an empty indicator cache, so the rolling indicators are included in both.
+
+    python benchmarks/bench_schedule.py [--max-ratio 3]
+
+Exits with status 1 when a daily run is more than max-ratio times slower than the monthly one.
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from dca_simulator.data_processing import data_process
+from dca_simulator.strategies import STRATEGIES
+from dca_simulator import indicators
+
+AAPL_CSV = Path(__file__).resolve().parent.parent / "AAPL_2000_2025.csv"
+
+
+def best_of(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        indicators.clear_cache()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-ratio", type=float, default=3)
+    args = parser.parse_args()
+
+    df = data_process(pd.read_csv(AAPL_CSV, index_col="Date", parse_dates=True))
+
+    failed = False
+    for name, strategy in STRATEGIES.items():
+        t_monthly, monthly = best_of(lambda: strategy(df, monthly_contrib=100))
+        t_daily, daily = best_of(lambda: strategy(df, monthly_contrib=100, schedule="daily"))
+
+        ratio = t_daily/t_monthly
+        failed |= ratio > args.max_ratio
+        print(f"{name:17s} monthly {len(monthly):5d} rows {t_monthly*1000:7.2f} ms, "
+              f"daily {len(daily):5d} rows {t_daily*1000:7.2f} ms, ratio {ratio:4.1f}x")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Benchmark suite of the strategies, compute_KeyMetrics, load_price_data and data_process, with a regression check.
+Runs on the bundled AAPL series and on synthetic series with 10x and 100x as many rows (block bootstrap of the AAPL
+returns, fixed seed): 10x as business days back to 1780, 100x as hourly bars since pandas timestamps stop in 2262.
+load_price_data uses an offline fetcher serving the synthetic frame, without and with the on-disk cache.
+Every case records its best time over --repeat runs and its peak memory (tracemalloc, measured in a separate run).
+
+    python benchmarks/bench_suite.py [--sizes 1 10 100] [--repeat 5] [--only dca_] [--output run.json]
+    python benchmarks/bench_suite.py --compare baseline.json [--threshold 0.25]
+
+Results are written as JSON with --output. With --compare, exits with status 1 when a case is more than threshold
+slower (or uses more than threshold more memory) than in the baseline file, differences below --min-seconds
+or --min-mb are ignored as noise.
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import datetime as dt
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from dca_simulator.data_processing import data_process
+from dca_simulator.data_loader import load_price_data
+from dca_simulator.strategies import STRATEGIES
+from dca_simulator.metrics import compute_KeyMetrics
+from dca_simulator.montecarlo import block_bootstrap_paths
+from dca_simulator import indicators
+
+AAPL_CSV = ROOT / "AAPL_2000_2025.csv"
+
+#size -> frequency of the synthetic calendar
+CALENDARS = {10: "B", 100: "h"}
+
+
+def load_aapl():
+    return pd.read_csv(AAPL_CSV, index_col="Date", parse_dates=True)
+
+
+def synthetic(aapl, size: int, seed: int = 0):
+    """size times as many rows as the AAPL series, ending on its last date. The returns are demeaned and given
+    the drift that makes the whole series grow like AAPL did, so the prices stay in a realistic range"""
+
+    close = aapl["Close"].dropna().to_numpy(dtype=float)
+    returns = np.diff(np.log(close))
+    n = len(close)*size
+    returns = returns - returns.mean() + returns.sum()/(n-1)
+
+    prices = block_bootstrap_paths(returns, 1, n, close[0], rng=seed)[0]
+    index = pd.date_range(end=aapl.index[-1], periods=n, freq=CALENDARS[size], name="Date")
+    return pd.DataFrame({"Close": prices}, index=index)
+
+
+def cases(raw, cache_dir):
+    """name -> function of one dataset, every call does the whole work (the indicator cache is cleared first)"""
+
+    df = data_process(raw)
+    start, end = str(df.index[0].date()), str((df.index[-1] + pd.Timedelta(days=1)).date())
+    fetcher = lambda ticker, start_date, end_date: raw.loc[start_date:end_date]
+    load_price_data("BENCH", start, end, fetcher=fetcher, cache_dir=cache_dir) #warm cache for the cached case
+
+    result = STRATEGIES["dca_standard"](df, monthly_contrib=100)
+
+    out = {
+        "data_process": lambda: data_process(raw),
+        "load_price_data": lambda: load_price_data("BENCH", start, end, fetcher=fetcher, cache_dir=None),
+        "load_price_data_cached": lambda: load_price_data("BENCH", start, end, fetcher=fetcher, cache_dir=cache_dir),
+        "compute_KeyMetrics": lambda: compute_KeyMetrics(result)
+    }
+    for name, strategy in STRATEGIES.items():
+        out[name] = lambda strategy=strategy: strategy(df, monthly_contrib=100)
+    return out
+
+
+def measure(func, repeat):
+    times = []
+    for _ in range(repeat):
+        indicators.clear_cache()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+
+    indicators.clear_cache()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"seconds": min(times), "peak_mb": peak/2**20, "rows": len(result) if hasattr(result, "__len__") else None}
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"date": dt.datetime.now().isoformat(timespec="seconds"), "commit": commit, "python": platform.python_version(),
+            "numpy": np.__version__, "pandas": pd.__version__, "machine": platform.machine(), "platform": platform.platform()}
+
+
+def compare(results, baseline, threshold, min_seconds, min_mb):
+    """Prints the ratios to the baseline, returns the names of the regressed cases"""
+
+    regressed = []
+    for name, new in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        slower = new["seconds"] > old["seconds"]*(1 + threshold) and new["seconds"] - old["seconds"] > min_seconds
+        bigger = new["peak_mb"] > old["peak_mb"]*(1 + threshold) and new["peak_mb"] - old["peak_mb"] > min_mb
+        flag = "REGRESSION" if slower or bigger else ""
+        print(f"{name:34s} time {new['seconds']/old['seconds']:5.2f}x  memory {new['peak_mb']/max(old['peak_mb'], 1e-9):5.2f}x  {flag}")
+        if flag:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100], help="1 = AAPL, 10/100 = synthetic")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", default="", help="only the cases whose name contains this")
+    parser.add_argument("--output", help="JSON file for the results")
+    parser.add_argument("--compare", help="JSON file of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown/memory growth, 0.25 = 25%%")
+    parser.add_argument("--min-seconds", type=float, default=0.002)
+    parser.add_argument("--min-mb", type=float, default=1.0)
+    args = parser.parse_args()
+
+    aapl = load_aapl()
+    results = {}
+    for size in args.sizes:
+        label = "aapl" if size == 1 else f"x{size}"
+        raw = aapl if size == 1 else synthetic(aapl, size)
+
+        with tempfile.TemporaryDirectory(prefix="dca_bench_") as cache_dir:
+            for name, func in cases(raw, cache_dir).items():
+                if args.only not in name:
+                    continue
+                results[f"{label}/{name}"] = row = measure(func, args.repeat)
+                print(f"{label + '/' + name:34s} {row['seconds']*1000:9.2f} ms  peak {row['peak_mb']:8.1f} MB  rows {row['rows']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"meta": metadata(), "results": results}, indent=2))
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())["results"]
+        regressed = compare(results, baseline, args.threshold, args.min_seconds, args.min_mb)
+        if regressed:
+            print(f"{len(regressed)} regression(s) above {args.threshold:.0%}: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
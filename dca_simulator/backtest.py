@@ -1,4 +1,13 @@
+import itertools
+import inspect
+import numpy as np
 import pandas as pd
+from .strategies import dca_standard, dca_DD, lump_sum, dca_sma_mom, dca_sma_mean_rev, value_averaging
+from .engine import accumulate, cash_growth, value_averaging_contributions, value_averaging_goals
+from .metrics import compute_KeyMetrics_batch
+from . import indicators
+from .kernels import rolling_max_many, sma_many
+from .scheduler import buying_days
 
 def perf_backtest(df: pd.DataFrame, strategy, **strategy_kwargs):
     """Function to perform a certain strategy"""
@@ -8,5 +17,122 @@ def perf_backtest(df: pd.DataFrame, strategy, **strategy_kwargs):
 
 
 
+def sweep(df: pd.DataFrame, strategies: dict, schedule=None, frictions=None):
+    """Evaluates many parameter configurations of one or several strategies in one call.
+    strategies maps a strategy function to either a grid (dict of lists, every combination is run)
+    or a list of parameter dicts, e.g. {dca_DD: {"monthly_contrib": [100, 150], "DD_threshold": [0.1, 0.2]}}.
+    The monthly resample and the rolling indicators are computed once and shared by all configs.
+    schedule applies to every config, see scheduler.buying_days (default: first trading day of each month),
+    frictions as well, see engine.FRICTIONS (default: frictionless). The configs run together through the compiled kernel.
+    Returns a table with one row per config: strategy name, parameters and the compute_KeyMetrics numbers"""
 
+    monthly_close = indicators.scheduled(df, schedule)["Close"] #we buy at the first trading day of each month
+    first_day = buying_days(df.index, schedule)[1] #position of that trading day in the daily data
+    market = {"close": df["Close"].to_numpy(dtype=float), "monthly_close": monthly_close.to_numpy(), "first_day": first_day}
+    growth = cash_growth(monthly_close.index, frictions.get("cash_rate")) if frictions else None
 
+    tables = []
+
+    for strategy, params in strategies.items():
+        if strategy not in _CONTRIBUTIONS:
+            raise ValueError(f"sweep does not support the strategy '{strategy.__name__}'")
+
+        configs = _with_defaults(strategy, _expand_grid(params))
+        if "schedule" in configs[0] or "frictions" in configs[0]:
+            raise ValueError("the schedule and frictions are shared by all configs, pass them to sweep()")
+        columns = {name: np.array([config[name] for config in configs], dtype=float) for name in configs[0]}
+
+        contributions = _CONTRIBUTIONS[strategy](market, columns)
+        deposits = columns["monthly_contrib"][:, None] if strategy in (dca_sma_mom, dca_sma_mean_rev) else None #skipped months stay in cash
+        goal = None
+        if strategy is value_averaging and frictions is not None: #tops up from the shares and cash left after fees, see engine.accumulate
+            goal = value_averaging_goals(len(monthly_close), columns["goal_monthly_growth"], columns["monthly_contrib"])
+        results = accumulate(market["monthly_close"], contributions, frictions, deposits, growth, goal)
+        metrics = compute_KeyMetrics_batch(monthly_close.index, results["invested_total"], results["portf_value"])
+
+        table = pd.DataFrame(configs)
+        table.insert(0, "Strategy", strategy.__name__)
+        tables.append(pd.concat([table, pd.DataFrame(metrics)], axis=1))
+
+    results = pd.concat(tables, ignore_index=True)
+    metric_cols = list(metrics)
+    return results[[c for c in results.columns if c not in metric_cols] + metric_cols] #parameters first, then the metrics
+
+
+
+def _expand_grid(params):
+    """Turns a grid (dict of lists) into the list of all its combinations, a list of dicts is returned as is"""
+
+    if isinstance(params, dict):
+        values = [v if isinstance(v, (list, tuple, np.ndarray, range)) else [v] for v in params.values()]
+        return [dict(zip(params, combo)) for combo in itertools.product(*values)]
+
+    return [dict(p) for p in params]
+
+
+def _with_defaults(strategy, configs):
+    """Completes every config with the default values of the strategy's signature"""
+
+    params = [p for name, p in inspect.signature(strategy).parameters.items() if name != "df"]
+    completed = []
+
+    for config in configs:
+        missing = [p.name for p in params if p.name not in config and p.default is inspect.Parameter.empty]
+        if missing:
+            raise ValueError(f"Missing parameters for {strategy.__name__}: {missing}")
+
+        completed.append({p.name: config.get(p.name, p.default) for p in params #keeps the order of the signature
+                          if p.name in config or p.default is not None}) #optional extras (e.g. goal_schedule) are not swept
+
+    return completed
+
+
+def _sma_gap(market, sma_period):
+    """Close minus its SMA at the first trading day of each month, one row per requested sma_period"""
+
+    periods, rows = np.unique(sma_period.astype(int), return_inverse=True)
+    sma = sma_many(market["close"], periods)[..., market["first_day"]] #all distinct windows from one cumulative sum
+
+    return (market["monthly_close"] - sma)[rows]
+
+
+def _contrib_standard(market, columns):
+    return np.repeat(columns["monthly_contrib"][:, None], market["monthly_close"].shape[-1], axis=1)
+
+
+def _contrib_DD(market, columns):
+    close = market["close"]
+    drawdown = (close/rolling_max_many(close, [252])[0])[..., market["first_day"]]
+    DD_cond = drawdown[None] <= (1-columns["DD_threshold"])[:, None]
+    return columns["monthly_contrib"][:, None]*np.where(DD_cond, 2, 1)
+
+
+def _contrib_lump_sum(market, columns):
+    n_months = market["monthly_close"].shape[-1]
+    contributions = np.zeros((len(columns["monthly_contrib"]), n_months))
+    contributions[:, 0] = columns["monthly_contrib"]*n_months #same capital as Normal DCA, all on day one
+    return contributions
+
+
+def _contrib_sma_mom(market, columns):
+    above_sma = _sma_gap(market, columns["sma_period"]) > 0
+    return np.where(above_sma, columns["monthly_contrib"][:, None], 0)
+
+
+def _contrib_sma_mean_rev(market, columns):
+    below_sma = _sma_gap(market, columns["sma_period"]) < 0
+    return np.where(below_sma, columns["monthly_contrib"][:, None], 0)
+
+
+def _contrib_value_averaging(market, columns):
+    return value_averaging_contributions(market["monthly_close"], columns["goal_monthly_growth"], columns["monthly_contrib"])
+
+
+_CONTRIBUTIONS = {
+    dca_standard: _contrib_standard,
+    dca_DD: _contrib_DD,
+    lump_sum: _contrib_lump_sum,
+    dca_sma_mom: _contrib_sma_mom,
+    dca_sma_mean_rev: _contrib_sma_mean_rev,
+    value_averaging: _contrib_value_averaging
+}
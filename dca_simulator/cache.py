@@ -0,0 +1,55 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Small thread-safe least-recently-used cache with hit/miss counters.
+    Keeps at most maxsize entries, entries older than ttl seconds are recomputed (ttl=None: never expire)"""
+
+    def __init__(self, maxsize: int = 128, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value of key, or computes, stores and returns it"""
+
+        with self._lock:
+            if key in self._data:
+                value, created = self._data[key]
+                if self.ttl is None or time.monotonic() - created < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key] #expired
+            self.misses += 1
+
+        value = compute() #computed outside the lock so a slow entry does not block the others
+
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False) #evict the least recently used entry
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Counters for monitoring"""
+
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "size": len(self._data),
+                    "maxsize": self.maxsize,
+                    "ttl": self.ttl,
+                    "hit_rate": self.hits/total if total else 0.0}
@@ -0,0 +1,125 @@
+import numpy as np
+from .downsample import downsample, visible
+
+_DEFAULT_POINTS = 800 #points per curve until the plot width is known
+
+
+class DownsampledChart:
+    """Bokeh line chart of the dashboard that only sends what the plot can show.
+    Every curve is downsampled (LTTB or min-max, see downsample.py) to about one point per pixel of the plot width,
+    the full series stay on the server and zooming or panning sends the visible part again at full detail.
+    The ColumnDataSource of a curve is kept from one render to the next: same x -> patch of y only,
+    x extended at the end -> stream of the new points, otherwise the data is replaced.
+    payload is the number of bytes of data sent by the last render (Bokeh sends the arrays as binary buffers),
+    full_payload what sending the full series would have cost"""
+
+    def __init__(self, title: str = "", method: str = "lttb", points: int | None = None, height: int = 350):
+        from bokeh.plotting import figure #bokeh comes with panel, only the dashboard needs it
+        from bokeh.models import HoverTool, Range1d
+        from bokeh.events import RangesUpdate
+
+        self.figure = figure(title=title, x_axis_type="datetime", x_range=Range1d(0, 1), height=height,
+                             sizing_mode="stretch_width", tools="pan,wheel_zoom,box_zoom,reset,save")
+        self.figure.add_tools(HoverTool(tooltips=[("", "$name"), ("Date", "@x{%F}"), ("Value", "@y{0,0.00}")],
+                                        formatters={"@x": "datetime"}))
+        self.figure.on_event(RangesUpdate, self._on_zoom)
+
+        self.method = method
+        self.points = points #None: the plot width in pixels
+        self.series = {} #name -> full (x in ms, y) arrays
+        self.sources = {}
+        self.renderers = {}
+        self.colors = {}
+        self.window = None #visible (start, end) when zoomed in
+        self.payload = 0
+        self.full_payload = 0
+
+    def render(self, series: dict):
+        """Shows series, a dict name -> (dates, values), in place of the current curves. Returns the payload in bytes"""
+
+        for name in [name for name in self.sources if name not in series]:
+            self._remove(name)
+
+        self.series = {}
+        for name, (dates, values) in series.items():
+            x = np.asarray(dates, dtype="datetime64[ms]").astype(np.int64).astype(float) #Bokeh datetimes are ms since epoch
+            self.series[name] = (x, np.asarray(values, dtype=float))
+
+        self._set_extent()
+        self.payload = sum(self._send(name) for name in self.series)
+        self.full_payload = sum(x.nbytes + y.nbytes for x, y in self.series.values())
+        return self.payload
+
+    def _set_extent(self):
+        if not self.series:
+            return
+        start = min(x[0] for x, _ in self.series.values() if len(x))
+        end = max(x[-1] for x, _ in self.series.values() if len(x))
+        x_range = self.figure.x_range
+        if (x_range.reset_start, x_range.reset_end) != (start, end): #new data: zoomed out to all of it
+            x_range.start, x_range.end = x_range.reset_start, x_range.reset_end = start, end
+            self.window = None
+
+    def _on_zoom(self, event):
+        x_range = self.figure.x_range
+        zoomed = event.x0 > x_range.reset_start or event.x1 < x_range.reset_end
+        window = (event.x0, event.x1) if zoomed else None
+        if window != self.window:
+            self.window = window
+            self.payload = sum(self._send(name) for name in self.series)
+
+    def _n_points(self):
+        from bokeh.core.property.descriptors import UnsetValueError
+
+        if self.points:
+            return self.points
+        try:
+            return self.figure.inner_width or _DEFAULT_POINTS #width in pixels, known once the browser has drawn the plot
+        except UnsetValueError:
+            return _DEFAULT_POINTS
+
+    def _send(self, name):
+        """Downsamples one curve for the current window and updates its source with as little data as possible"""
+
+        x, y = self.series[name]
+        if self.window is not None:
+            part = visible(x, *self.window)
+            x, y = x[part], y[part]
+        x, y = downsample(x, y, self._n_points(), self.method)
+
+        if name not in self.sources:
+            self._add(name)
+        source = self.sources[name]
+        old_x, old_y = np.asarray(source.data["x"]), np.asarray(source.data["y"])
+        k = len(old_x)
+
+        if k == len(x) and np.array_equal(old_x, x):
+            changed = np.flatnonzero((old_y != y) & ~(np.isnan(old_y) & np.isnan(y)))
+            if len(changed):
+                source.patch({"y": [(slice(int(changed[0]), int(changed[-1])+1), y[changed[0]:changed[-1]+1])]})
+            return y[changed[0]:changed[-1]+1].nbytes if len(changed) else 0
+
+        if 0 < k < len(x) and np.array_equal(old_x, x[:k]) and np.array_equal(old_y, y[:k], equal_nan=True):
+            source.stream({"x": x[k:], "y": y[k:]})
+            return x[k:].nbytes + y[k:].nbytes
+
+        source.data = {"x": x, "y": y}
+        return x.nbytes + y.nbytes
+
+    def _add(self, name):
+        from bokeh.models import ColumnDataSource
+        from bokeh.palettes import Category10_10
+
+        color = self.colors.setdefault(name, Category10_10[len(self.colors) % 10])
+        source = ColumnDataSource({"x": np.array([]), "y": np.array([])})
+        self.sources[name] = source
+        self.renderers[name] = self.figure.line("x", "y", source=source, color=color, line_width=2, legend_label=name, name=name)
+        self.figure.legend.location = "top_left"
+        self.figure.legend.click_policy = "hide"
+
+    def _remove(self, name):
+        renderer = self.renderers.pop(name)
+        self.figure.renderers = [r for r in self.figure.renderers if r is not renderer]
+        for legend in self.figure.legend:
+            legend.items = [item for item in legend.items if renderer not in item.renderers]
+        del self.sources[name]
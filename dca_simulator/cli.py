@@ -0,0 +1,127 @@
+"""Headless batch runner: python -m dca_simulator --spec spec.json --out results/
+
+The spec is a JSON file:
+    {
+        "tickers": ["AAPL", "MSFT"],
+        "start_date": "2010-01-01",
+        "end_date": "2024-12-31",
+        "strategies": {
+            "DCA": {"strategy": "dca_standard", "monthly_contrib": 150},
+            "DD 20%": {"strategy": "dca_DD", "monthly_contrib": 150, "DD_threshold": 0.2},
+            "DCA weekly, fees": {"strategy": "dca_standard", "monthly_contrib": 35, "schedule": "weekly",
+                                 "frictions": {"fee_fixed": 1.0, "whole_shares": true}}
+        }
+    }
+
+Every (ticker, strategy) result is written to <out>/series/<ticker>__<label>.<format> and the
+Key Metrics of all of them to <out>/metrics.<format>. Successful jobs are recorded in <out>/done.jsonl
+with a key of their inputs (strategy, parameters, dates, format), so --resume only runs what is missing, failed
+or was run with other inputs. Nothing from the plotting stack is imported here.
+"""
+import sys
+import json
+import hashlib
+import datetime as dt
+import argparse
+from pathlib import Path
+import pandas as pd
+from .strategies import STRATEGIES
+from .runner import load_panel, iter_jobs, write_table
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m dca_simulator", description="Run DCA strategy backtests in batch")
+    parser.add_argument("--spec", required=True, help="JSON file with tickers, dates and strategies")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--tickers", nargs="+", help="overrides the tickers of the spec")
+    parser.add_argument("--start-date", help="overrides the start_date of the spec")
+    parser.add_argument("--end-date", help="overrides the end_date of the spec")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores, 1 = no pool)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="output format (parquet needs pyarrow)")
+    parser.add_argument("--resume", action="store_true", help="skip the jobs recorded in <out>/done.jsonl with the same inputs")
+    return parser.parse_args(argv)
+
+
+def load_spec(path):
+    """Reads the spec and resolves the strategy names, returns (tickers, start, end, {label: (strategy, kwargs)})"""
+
+    spec = json.loads(Path(path).read_text())
+
+    strategies = {}
+    for label, params in spec["strategies"].items():
+        params = dict(params)
+        name = params.pop("strategy")
+        if name not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{name}' for '{label}', expected one of {sorted(STRATEGIES)}")
+        strategies[label] = (STRATEGIES[name], params)
+
+    return spec.get("tickers", []), spec.get("start_date"), spec.get("end_date"), strategies
+
+
+def series_path(out, ticker, label, fmt):
+    safe_label = "".join(c if c.isalnum() or c in "-_." else "_" for c in label)
+    return out / "series" / f"{ticker}__{safe_label}.{fmt}"
+
+
+def job_key(strategy, kwargs, start_date, end_date, fmt):
+    """Hash of everything a job's results depend on besides its ticker, recorded in the manifest"""
+
+    inputs = json.dumps([strategy.__name__, kwargs, start_date, end_date, fmt], sort_keys=True, default=str)
+    return hashlib.blake2b(inputs.encode(), digest_size=8).hexdigest()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    tickers, start_date, end_date, strategies = load_spec(args.spec)
+    tickers = [t.upper().strip() for t in (args.tickers or tickers)]
+    start_date = args.start_date or start_date
+    end_date = args.end_date or end_date
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    manifest = out / "done.jsonl"
+    keys = {label: job_key(strategy, kwargs, start_date, end_date or dt.date.today().isoformat(), args.format)
+            for label, (strategy, kwargs) in strategies.items()} #no end date: up to today, so a new day runs again
+
+    done = {}
+    if args.resume and manifest.exists():
+        for line in manifest.read_text().splitlines():
+            if line.strip(): #a line cut by a crash is simply run again
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "Error" not in row and row.pop("Key", None) == keys.get(row["Strategy"]): #same inputs, and it worked
+                    done[(row["Ticker"], row["Strategy"])] = row
+    elif manifest.exists():
+        manifest.unlink()
+
+    todo = [(ticker, label) for ticker in tickers for label in strategies if (ticker, label) not in done]
+    print(f"{len(done)} jobs already done, {len(todo)} to run", file=sys.stderr)
+
+    if todo:
+        panel = load_panel(sorted({ticker for ticker, _ in todo}), start_date, end_date)
+        missing = sorted({ticker for ticker, _ in todo} - set(panel.columns))
+        if missing:
+            print(f"No data for {', '.join(missing)}", file=sys.stderr)
+
+        column = {ticker: j for j, ticker in enumerate(panel.columns)}
+        jobs = [(column[ticker], label, *strategies[label], series_path(out, ticker, label, args.format))
+                for ticker, label in todo if ticker in column]
+
+        with manifest.open("a") as f:
+            for row in iter_jobs(panel, jobs, args.workers):
+                if "Error" not in row: #failed jobs stay out of the manifest, --resume runs them again
+                    f.write(json.dumps({**row, "Key": keys[row["Strategy"]]}) + "\n")
+                    f.flush() #every finished job survives a crash of the batch
+                done[(row["Ticker"], row["Strategy"])] = row
+
+    metrics = pd.DataFrame(list(done.values()))
+    if not metrics.empty:
+        metrics = metrics.set_index(["Ticker", "Strategy"]).sort_index()
+    write_table(metrics, out / f"metrics.{args.format}")
+    print(f"Wrote {len(metrics)} metric rows to {out / f'metrics.{args.format}'}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,81 +1,270 @@
+import os
+import json
+import tempfile
+import threading
+import numpy as np
 import pandas as pd
-import yfinance as yf
 import datetime as dt
 from pathlib import Path
-from .data_processing import data_process  
+from .data_processing import data_process
+from . import profiling
 
 AAPL_CSV = Path(__file__).resolve().parent.parent / "AAPL_2000_2025.csv"
+CACHE_DIR = Path(os.environ.get("DCA_CACHE_DIR", Path.home() / ".cache" / "dca_simulator"))
 
-def load_price_data(ticker: str, start_date: str, end_date: str | None = None):
-    """Download daily close prices for a stock. If yfinance fails, fallback to local AAPL CSV."""
-        
-    if end_date == "" or end_date is None:
-        end_date = dt.date.today().strftime("%Y-%m-%d")  
+_MAX_EMPTY_GAP = pd.Timedelta(days=4) #a missing range this short can legitimately have no trading day (weekend + holiday)
+_ADJUSTED_RTOL = 1e-6 #a cached close re-downloaded this different was adjusted since (split, dividend)
+_OVERLAP = pd.Timedelta(days=10) #at most this far back to re-download the last cached bar (not for a delisted ticker)
+_PRICES_DTYPE = np.dtype([("date", "datetime64[ns]"), ("close", np.float64)]) #one record per day, dates and prices stay in step
 
-    ticker = ticker.upper().strip()
+_locks = {} #(cache dir, ticker) -> lock around the read-merge-write of its cache
+_locks_guard = threading.Lock()
 
-    # 1) Try yfinance
-    try:
+
+@profiling.timed()
+def yf_fetch(ticker: str, start_date: str, end_date: str):
+    """Default fetcher: daily Close prices from yfinance (end_date excluded). Any fetcher with this signature
+    returning a frame with a Close column can be passed to load_price_data, e.g. an offline stub in tests"""
+
+    import yfinance as yf #imported on first download only, it pulls in requests/curl and takes most of the import time
+
+    with profiling.stage("data_loader.yf_download"):
         df = yf.download(ticker, start=start_date, end=end_date, progress=False)
-    except Exception:
-        df = pd.DataFrame()
 
     if isinstance(getattr(df, "columns", None), pd.MultiIndex):
         df = df.droplevel(1, axis=1)
 
-    # 2) Fallback to CSV for AAPL
-    if (df is None or df.empty) and ticker == "AAPL" and AAPL_CSV.exists():
-        raw = pd.read_csv(AAPL_CSV)
-        raw["Date"] = pd.to_datetime(raw["Date"], errors="coerce")
-        raw = raw.dropna(subset=["Date"]).set_index("Date").sort_index()
+    return df
+
 
-        df = raw[["Close"]]
-        df = df.loc[pd.to_datetime(start_date): pd.to_datetime(end_date)]
+@profiling.timed()
+def load_price_data(ticker: str, start_date: str, end_date: str | None = None, fetcher=yf_fetch, cache_dir=CACHE_DIR):
+    """Download daily close prices for a stock. If yfinance fails, fallback to local AAPL CSV.
+    Prices are kept in a per-ticker cache in cache_dir, only the dates not cached yet are fetched (cache_dir=None disables it)"""
+
+    if end_date == "" or end_date is None:
+        end_date = dt.date.today().strftime("%Y-%m-%d")
+
+    ticker = ticker.upper().strip()
+
+    # 1) Try the cache, then fetcher for whatever is missing
+    if cache_dir is not None:
+        df = _load_cached(ticker, start_date, end_date, fetcher, Path(cache_dir))
+    else:
+        df = _fetch(fetcher, ticker, start_date, end_date)
+
+    # 2) Fallback to CSV for AAPL
+    if df.empty and ticker == "AAPL" and AAPL_CSV.exists():
+        df = load_csv_prices(AAPL_CSV, start_date, end_date, sidecar_dir=cache_dir if cache_dir is not None else AAPL_CSV.parent)
 
     # Still empty? return empty
-    if df is None or df.empty:
+    if df.empty:
         return pd.DataFrame(columns=["Close"])
 
-    # normalize to Close only
-    df = df[["Close"]]
+    return df #every source above already returns clean, sorted Close prices, no need for another data_process
 
-    df = data_process(df)
-    return df
 
-        # If there's a Date column, use it; otherwise assume first column is date
-        if "Date" in raw.columns:
+
+@profiling.timed()
+def load_csv_prices(csv_path, start_date: str, end_date: str, sidecar_dir=CACHE_DIR):
+    """Close prices between start_date and end_date (both included) from a Date/Close CSV.
+    The CSV is parsed only once and converted into a sorted binary sidecar (datetime64 + float64 .npy file)
+    in sidecar_dir, later calls memory-map the sidecar and slice it with searchsorted"""
+
+    csv_path, sidecar_dir = Path(csv_path), Path(sidecar_dir)
+    name = f"{csv_path.stem}_csv"
+    path = _array_path(sidecar_dir, name)
+
+    arrays = _load_arrays(sidecar_dir, name) if path.exists() and path.stat().st_mtime >= csv_path.stat().st_mtime else None
+    if arrays is not None:
+        dates, close = arrays
+    else:
+        with profiling.stage("data_loader.csv_parse"):
+            raw = pd.read_csv(csv_path)
             raw["Date"] = pd.to_datetime(raw["Date"], errors="coerce")
-            raw = raw.dropna(subset=["Date"]).set_index("Date")
-        else:
-            raw.iloc[:, 0] = pd.to_datetime(raw.iloc[:, 0], errors="coerce")
-            raw = raw.dropna(subset=[raw.columns[0]]).set_index(raw.columns[0])
+        raw = data_process(raw.dropna(subset=["Date"]).set_index("Date")[["Close"]])
 
-        raw = raw.sort_index()
+        dates = raw.index.to_numpy(dtype="datetime64[ns]")
+        close = raw["Close"].to_numpy(dtype=np.float64)
+        try:
+            _save_arrays(sidecar_dir, name, dates, close)
+        except OSError:
+            pass #read-only location, we still return the parsed prices
 
-        if "Close" in raw.columns:
-            df = raw[["Close"]]
-        elif "Adj Close" in raw.columns:
-            df = raw[["Adj Close"]].rename(columns={"Adj Close": "Close"})
-        else:
-            df = pd.DataFrame()
+    lo = np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date), "ns"), side="left")
+    hi = np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date), "ns"), side="right") #end_date included like a label slice
+    return _to_frame(dates[lo:hi], close[lo:hi])
 
-        if not df.empty:
-            df = df.loc[pd.to_datetime(start_date): pd.to_datetime(end_date)]
 
-    # Still empty -> return empty
-    if df is None or df.empty:
-        return pd.DataFrame(columns=["Close"])
 
-    # normalize to Close only
-    if "Close" in df.columns:
-        df = df[["Close"]]
-    elif "Adj Close" in df.columns:
-        df = df[["Adj Close"]].rename(columns={"Adj Close": "Close"})
-    else:
+def _fetch(fetcher, ticker, start_date, end_date):
+    """Calls the fetcher, a failing download is treated as no data"""
+
+    try:
+        with profiling.stage("data_loader.fetch"):
+            df = fetcher(ticker, start_date, end_date)
+    except Exception:
+        df = None
+
+    if df is None or df.empty or "Close" not in df.columns:
         return pd.DataFrame(columns=["Close"])
 
-    df = data_process(df)
-    return df
+    return data_process(df[["Close"]])
+
+
+def _array_path(directory, name):
+    return directory / f"{name}_prices.npy"
+
+
+def _load_arrays(directory, name):
+    """Memory-maps the dates/close arrays saved by _save_arrays. None if the file is missing or unreadable"""
+
+    try:
+        prices = np.load(_array_path(directory, name), mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if prices.dtype != _PRICES_DTYPE or prices.ndim != 1:
+        return None
+    return prices["date"], prices["close"]
+
+
+def _atomic_write(path, write):
+    """write(file) fills a temp file of its own next to path, which is then swapped in with one os.replace:
+    a crash or a concurrent writer never leaves a half-written or mixed file"""
+
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            write(file)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _save_arrays(directory, name, dates, close):
+    """Saves dates and close as one file of (date, close) records, so they can only be replaced together"""
+
+    directory.mkdir(parents=True, exist_ok=True)
+
+    prices = np.empty(len(dates), dtype=_PRICES_DTYPE)
+    prices["date"], prices["close"] = dates, close
+    _atomic_write(_array_path(directory, name), lambda file: np.save(file, prices))
+
+
+def _to_frame(dates, close):
+    """Usual one-column Close frame, copied out of the memory-mapped arrays"""
+
+    return pd.DataFrame({"Close": np.array(close)}, index=pd.DatetimeIndex(np.array(dates), name="Date"))
+
+
+def _read_cache(cache_dir, ticker):
+    """Returns (dates, close, covered range) of a ticker, the arrays are memory-mapped.
+    None if not cached or if the cache is unreadable, it is then rebuilt like a missing one"""
+
+    meta = cache_dir / f"{ticker}.json"
+    arrays = _load_arrays(cache_dir, ticker) if meta.exists() else None
+    if arrays is None:
+        return None
+
+    try:
+        covered = json.loads(meta.read_text())
+        covered = (pd.Timestamp(covered["start"]), pd.Timestamp(covered["end"]))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return (*arrays, covered)
+
+
+def _write_cache(cache_dir, ticker, dates, close, covered):
+    """Prices first, then the covered range: a crash in between leaves a range smaller than the data, never larger"""
+
+    _save_arrays(cache_dir, ticker, dates, close)
+
+    meta = json.dumps({"start": str(covered[0].date()), "end": str(covered[1].date())})
+    _atomic_write(cache_dir / f"{ticker}.json", lambda file: file.write(meta.encode()))
+
+
+def _ticker_lock(cache_dir, ticker):
+    with _locks_guard:
+        return _locks.setdefault((str(cache_dir), ticker), threading.Lock())
+
+
+@profiling.timed("data_loader.cache")
+def _load_cached(ticker, start_date, end_date, fetcher, cache_dir):
+    """Serves [start_date, end_date) from the cache after fetching and appending the missing part of the range.
+    Loads of the same ticker wait for each other (the dashboard loads on a thread pool), so the cache is updated
+    by one of them at a time and the others find the range already covered"""
+
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    if start >= end:
+        return _to_frame(np.array([], dtype="datetime64[ns]"), np.array([], dtype=np.float64))
+
+    with _ticker_lock(cache_dir, ticker):
+        return _update_cache(ticker, start, end, fetcher, cache_dir)
+
+
+def _update_cache(ticker, start, end, fetcher, cache_dir):
+    today = pd.Timestamp(dt.date.today()) #days from today on may still get bars, they are never marked as covered
+    cached = _read_cache(cache_dir, ticker)
+
+    if cached is None:
+        dates = np.array([], dtype="datetime64[ns]")
+        close = np.array([], dtype=np.float64)
+        missing = [(start, end)]
+        covered = None
+    else: #every extension downloads the cached bar next to it again, to check its adjusted price did not change
+        dates, close, covered = cached
+        missing = []
+        if start < covered[0]:
+            first = pd.Timestamp(dates[0]) + pd.Timedelta(days=1) if len(dates) else covered[0]
+            missing.append((start, max(covered[0], min(first, covered[0] + _OVERLAP))))
+        if end > covered[1]:
+            last = pd.Timestamp(dates[-1]) if len(dates) else covered[1]
+            missing.append((min(covered[1], max(last, covered[1] - _OVERLAP)), end))
+
+    if missing:
+        new_start, new_end = covered if covered is not None else (end, start)
+        pieces = []
+        extended = False
+
+        for lo, hi in missing:
+            piece = _fetch(fetcher, ticker, lo.strftime("%Y-%m-%d"), hi.strftime("%Y-%m-%d"))
+            if piece.empty and hi - lo > _MAX_EMPTY_GAP:
+                continue #probably a failed download, do not mark the range as covered
+            if not piece.empty:
+                if covered is not None and _rescaled(piece["Close"], dates, close):
+                    return _rebuild_cache(ticker, start, end, fetcher, cache_dir, covered)
+                pieces.append(piece["Close"])
+            if min(hi, today) > lo: #only the past is covered, later calls fetch the bars added since
+                new_start, new_end = min(new_start, lo), max(new_end, min(hi, today))
+                extended = True
+
+        if pieces or extended:
+            old = pd.Series(np.asarray(close), index=pd.DatetimeIndex(np.asarray(dates)))
+            merged = pd.concat([old] + pieces)
+            merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+
+            dates = merged.index.to_numpy(dtype="datetime64[ns]")
+            close = merged.to_numpy(dtype=np.float64)
+            if new_start < new_end:
+                _write_cache(cache_dir, ticker, dates, close, (new_start, new_end))
+
+    lo, hi = np.searchsorted(dates, [np.datetime64(start, "ns"), np.datetime64(end, "ns")])
+    return _to_frame(dates[lo:hi], close[lo:hi])
+
+
+def _rescaled(piece, dates, close):
+    """True when the fetched prices disagree with the cached ones on their common dates. yfinance returns
+    split and dividend adjusted closes, every new split or dividend rescales the whole history"""
+
+    common = piece.index[np.isin(piece.index.to_numpy(dtype="datetime64[ns]"), dates)]
+    cached = np.asarray(close)[np.searchsorted(dates, common.to_numpy(dtype="datetime64[ns]"))]
+    return not np.allclose(piece[common].to_numpy(dtype=np.float64), cached, rtol=_ADJUSTED_RTOL, atol=0)
 
 
+def _rebuild_cache(ticker, start, end, fetcher, cache_dir, covered):
+    """Drops a cache whose prices are on an older adjustment basis and downloads its whole range again"""
 
+    (cache_dir / f"{ticker}.json").unlink(missing_ok=True) #without its covered range the cache reads as missing
+    df = _update_cache(ticker, min(start, covered[0]), max(end, covered[1]), fetcher, cache_dir)
+    return df.loc[(df.index >= start) & (df.index < end)]
@@ -1,5 +1,7 @@
 import pandas as pd
+from .profiling import timed
 
+@timed()
 def data_process(df: pd.DataFrame):
     df = df.copy().dropna() #to ensure that our strategies do not break if trying to invest on a day with missing data
     
@@ -0,0 +1,107 @@
+import numpy as np
+from .engine import _jit
+
+
+def lttb(x, y, n_out: int):
+    """Positions of the n_out points kept by Largest-Triangle-Three-Buckets, in order.
+    The first and last points are always kept, every bucket in between keeps the point making the largest triangle
+    with the point kept in the previous bucket and the mean of the next bucket, which keeps the shape of the curve
+    (peaks, crashes) far better than taking every k-th point. x must be increasing, NaN values are never picked"""
+
+    x = np.ascontiguousarray(x, dtype=float)
+    y = np.ascontiguousarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n-1, n_out-1).astype(np.int64) #n_out-2 buckets between the first and the last point
+    compiled = _jit("lttb", _lttb_loop)
+    return (compiled or _lttb_numpy)(x, y, edges)
+
+
+def _lttb_loop(x, y, edges):
+    n, n_buckets = len(x), len(edges) - 1
+    out = np.empty(n_buckets + 2, dtype=np.int64)
+    out[0], out[-1] = 0, n-1
+
+    a = 0
+    for b in range(n_buckets):
+        lo, hi = edges[b], edges[b+1]
+        next_lo, next_hi = hi, (edges[b+2] if b+2 <= n_buckets else n)
+
+        avg_x, avg_y, count = 0.0, 0.0, 0
+        for j in range(next_lo, next_hi):
+            if y[j] == y[j]: #not NaN
+                avg_x += x[j]
+                avg_y += y[j]
+                count += 1
+        if count:
+            avg_x, avg_y = avg_x/count, avg_y/count
+        else:
+            avg_x, avg_y = x[next_lo], y[a]
+
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - avg_x)*(y[j] - y[a]) - (x[a] - x[j])*(avg_y - y[a]))
+            if area > best_area: #False for NaN
+                best, best_area = j, area
+        out[b+1] = best
+        a = best
+
+    return out
+
+
+def _lttb_numpy(x, y, edges):
+    n, n_buckets = len(x), len(edges) - 1
+    out = np.empty(n_buckets + 2, dtype=np.int64)
+    out[0], out[-1] = 0, n-1
+    bounds = np.append(edges, n)
+
+    a = 0
+    for b in range(n_buckets):
+        lo, hi = bounds[b], bounds[b+1]
+        next_x, next_y = x[hi:bounds[b+2]], y[hi:bounds[b+2]]
+        valid = ~np.isnan(next_y)
+        avg_x, avg_y = (next_x[valid].mean(), next_y[valid].mean()) if valid.any() else (x[hi], y[a])
+
+        area = np.abs((x[a] - avg_x)*(y[lo:hi] - y[a]) - (x[a] - x[lo:hi])*(avg_y - y[a]))
+        a = lo + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        out[b+1] = a
+
+    return out
+
+
+def min_max(y, n_out: int):
+    """Positions of the min and the max of n_out/2 equal buckets (plus the first and last points), in order.
+    Keeps every spike of the data, the usual choice for long noisy series such as daily prices"""
+
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, n_out//2 + 1).astype(np.int64)
+    bucket = np.repeat(np.arange(len(edges)-1), np.diff(edges))
+    order = np.lexsort((np.nan_to_num(y, nan=np.inf), bucket)) #sorted by bucket, then by value: min first, max last
+    keep = np.concatenate(([0, n-1], order[edges[:-1]], order[edges[1:]-1]))
+    return np.unique(keep)
+
+
+def visible(x, start, end):
+    """Slice of the increasing x between start and end, with one more point on each side so the lines reach the edges"""
+
+    lo = max(int(np.searchsorted(x, start, side="left")) - 1, 0)
+    hi = min(int(np.searchsorted(x, end, side="right")) + 1, len(x))
+    return slice(lo, hi)
+
+
+METHODS = {"lttb": lambda x, y, n_out: lttb(x, y, n_out), "minmax": lambda x, y, n_out: min_max(y, n_out)}
+
+
+def downsample(x, y, n_out: int, method: str = "lttb"):
+    """(x, y) reduced to about n_out points with METHODS[method]"""
+
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}', use one of {list(METHODS)}")
+    keep = METHODS[method](x, y, n_out)
+    return x[keep], y[keep]
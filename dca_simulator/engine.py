@@ -0,0 +1,336 @@
+import numpy as np
+
+#trading frictions understood by accumulate, all off by default
+FRICTIONS = {
+    "fee_fixed": 0.0, #$ per trade
+    "fee_pct": 0.0, #fraction of the amount traded, e.g. 0.001 for 0.1%
+    "whole_shares": False, #buy whole shares only, what cannot be spent stays in cash for the next purchase
+    "cash_rate": None #annual interest on the cash. A number (even 0) also keeps the deposits a strategy skips in cash
+}
+
+
+def accumulate(close, contributions, frictions=None, deposits=None, cash_growth=None, goal=None):
+    """Accumulation engine shared by the strategies.
+    Buys contributions/close every period and returns the running shares_total, invested_total,
+    portf_value and profit_loss as NumPy arrays.
+    Works on 1-D arrays (one strategy) or 2-D arrays (configs x periods), the time axis is always the last one.
+
+    frictions is an optional dict of FRICTIONS (fees, whole-share rounding, interest on cash), the results then also
+    have the cash and fees_total columns. deposits is the money the investor puts in every period when it differs
+    from what the strategy buys (e.g. the skipped months of the SMA strategies), only used with a cash_rate.
+    cash_growth is the growth factor of cash over each period, see cash_growth().
+    goal (with frictions only) are the target values of Value Averaging: every period then invests what is missing
+    to reach its goal after fees, from the shares and cash actually held, in place of contributions"""
+
+    close = np.asarray(close, dtype=float)
+    contributions = np.asarray(contributions, dtype=float)
+
+    if frictions is not None:
+        return _accumulate_frictions(close, contributions, frictions, deposits, cash_growth, goal)
+    if goal is not None:
+        raise ValueError("goal is only used with frictions, see value_averaging_contributions otherwise")
+
+    shares_bought = contributions/close
+    shares_total = np.cumsum(shares_bought, axis=-1) #np.cumsum adds sequentially, so it gives the same numbers as the old += loop
+    invested_total = np.cumsum(contributions, axis=-1)
+    portf_value = shares_total*close
+
+    return {
+        "shares_total": shares_total,
+        "invested_total": invested_total,
+        "portf_value": portf_value,
+        "profit_loss": portf_value - invested_total
+    }
+
+
+def accumulate_portfolio(close, contributions, weights, rebalance=None, drift_threshold=None):
+    """Accumulation engine of a target-weight portfolio: close is (assets x periods), every contribution is split
+    by weights (one per asset, summing to 1) and buys contribution*weight/close of each asset.
+    rebalance is an optional bool array (periods,): after that period's purchase the whole portfolio is sold and
+    bought back at the target weights. drift_threshold rebalances as well when a weight is that far from its target
+    (e.g. 0.05 for 5 percentage points).
+    Returns the shares and values per asset (assets x periods) and the totals, rebalanced and turnover (periods,),
+    turnover being the $ amount traded by the rebalancing (the buys, which equal the sells)"""
+
+    close = np.asarray(close, dtype=float)
+    contributions = np.asarray(contributions, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    n = close.shape[1]
+
+    bought = contributions*weights[:, None]/close
+    calendar = np.zeros(n, dtype=bool) if rebalance is None else np.asarray(rebalance, dtype=bool)
+
+    if rebalance is None and drift_threshold is None:
+        shares = np.cumsum(bought, axis=-1) #same sums as accumulate, a one-asset portfolio is the plain DCA
+        rebalanced = np.zeros(n, dtype=bool)
+        turnover = np.zeros(n)
+    else:
+        shares, rebalanced, turnover = _rebalanced_shares(close, bought, weights, calendar, drift_threshold)
+
+    values = shares*close
+    invested_total = np.cumsum(contributions, axis=-1)
+    portf_value = values.sum(axis=0)
+
+    return {
+        "shares": shares,
+        "values": values,
+        "invested_total": invested_total,
+        "portf_value": portf_value,
+        "profit_loss": portf_value - invested_total,
+        "rebalanced": rebalanced,
+        "turnover": turnover
+    }
+
+
+_LOOKAHEAD = 256 #periods computed at once between two rebalancings
+
+
+def _rebalanced_shares(close, bought, weights, calendar, drift_threshold):
+    """Holdings are only path dependent at the rebalancings: from the last one the shares are a cumulative sum,
+    computed for the next _LOOKAHEAD periods as a matrix. The first period due for a rebalancing (calendar or drift)
+    cuts the block, the portfolio is reset to the target weights there and the next block starts after it"""
+
+    n_assets, n = close.shape
+    shares = np.empty((n_assets, n))
+    rebalanced = np.zeros(n, dtype=bool)
+    turnover = np.zeros(n)
+    held = np.zeros(n_assets)
+
+    i = 0
+    while i < n:
+        end = min(i + _LOOKAHEAD, n)
+        path = held[:, None] + np.cumsum(bought[:, i:end], axis=-1)
+        due = calendar[i:end].copy()
+
+        if drift_threshold is not None:
+            values = path*close[:, i:end]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                drift = np.abs(values/values.sum(axis=0) - weights[:, None]).max(axis=0)
+            due |= drift > drift_threshold #NaN (empty portfolio) never triggers
+
+        if not due.any():
+            shares[:, i:end] = path
+            held = path[:, -1]
+            i = end
+            continue
+
+        k = int(np.argmax(due))
+        r = i + k
+        shares[:, i:r] = path[:, :k]
+
+        total = path[:, k] @ close[:, r]
+        held = total*weights/close[:, r]
+        shares[:, r] = held
+        rebalanced[r] = True
+        turnover[r] = np.maximum(held - path[:, k], 0) @ close[:, r]
+        i = r + 1
+
+    return shares, rebalanced, turnover
+
+
+def cash_growth(dates, cash_rate):
+    """Growth factor of cash between consecutive dates at an annual cash_rate (1 for the first period)"""
+
+    years = np.diff(np.asarray(dates, dtype="datetime64[D]").astype(np.int64), prepend=0)/365
+    years[0] = 0
+    return (1 + (cash_rate or 0.0))**years
+
+
+def _accumulate_frictions(close, contributions, frictions, deposits, growth, goal=None):
+    unknown = set(frictions) - set(FRICTIONS)
+    if unknown:
+        raise ValueError(f"Unknown frictions: {sorted(unknown)}, use {list(FRICTIONS)}")
+    frictions = {**FRICTIONS, **frictions}
+
+    keep_idle = frictions["cash_rate"] is not None and deposits is not None
+    one_row = close.ndim < 2 and contributions.ndim < 2 and np.ndim(deposits) < 2 and np.ndim(goal) < 2
+    close, contributions, deposits, goal_values = np.broadcast_arrays(
+        np.atleast_2d(close), np.atleast_2d(contributions), np.atleast_2d(deposits if keep_idle else contributions),
+        np.atleast_2d(contributions if goal is None else np.asarray(goal, dtype=float)))
+    growth = np.ones(close.shape[1]) if growth is None else np.asarray(growth, dtype=float)
+
+    args = [np.ascontiguousarray(a, dtype=float) for a in (close, contributions, deposits, goal_values)]
+    args += [growth, float(frictions["fee_fixed"]), float(frictions["fee_pct"]), bool(frictions["whole_shares"]), goal is not None]
+
+    compiled = _jit("frictions", _frictions_loop)
+    shares_total, invested_total, cash, fees_total = (compiled or _frictions_numpy)(*args)
+
+    portf_value = shares_total*close + cash
+    results = {
+        "shares_total": shares_total,
+        "invested_total": invested_total,
+        "portf_value": portf_value,
+        "profit_loss": portf_value - invested_total,
+        "cash": cash,
+        "fees_total": fees_total
+    }
+    if one_row:
+        return {name: values[0] for name, values in results.items()} #same shapes as the frictionless version
+    return results
+
+
+def _frictions_numpy(close, contributions, deposits, goal, growth, fee_fixed, fee_pct, whole_shares, value_averaging):
+    """Month by month recurrence of _frictions_loop, every step done for all configs together"""
+
+    shape = close.shape
+    shares_total, invested_total, cash, fees_total = (np.zeros(shape) for _ in range(4))
+    shares, invested, carry, reserve, fees = (np.zeros(shape[0]) for _ in range(5))
+
+    for i in range(shape[1]):
+        carry *= growth[i]
+        reserve *= growth[i]
+        if value_averaging:
+            missing = goal[:, i] - (shares*close[:, i] + carry)
+            contribution = np.where(missing > 0, np.maximum((goal[:, i] - shares*close[:, i])*(1 + fee_pct) + fee_fixed - carry, 0.0), 0.0)
+            deposit = contribution
+        else:
+            contribution, deposit = contributions[:, i], deposits[:, i]
+        invested += deposit
+        reserve += deposit - contribution
+
+        available = contribution + carry
+        budget = available - fee_fixed
+        bought = np.where(budget > 0, budget/(close[:, i]*(1 + fee_pct)), 0.0)
+        if whole_shares:
+            bought = np.floor(bought)
+            carry = np.where(bought > 0, available - (bought*close[:, i]*(1 + fee_pct) + fee_fixed), available)
+        else:
+            carry = np.where(bought > 0, 0.0, available) #a fractional buy spends everything
+        fees += np.where(bought > 0, fee_fixed + bought*close[:, i]*fee_pct, 0.0)
+        shares += bought
+
+        shares_total[:, i], invested_total[:, i], cash[:, i], fees_total[:, i] = shares, invested, carry + reserve, fees
+
+    return shares_total, invested_total, cash, fees_total
+
+
+def _frictions_loop(close, contributions, deposits, goal, growth, fee_fixed, fee_pct, whole_shares, value_averaging):
+    """One purchase per period: the contribution plus the cash left by earlier rounding is spent on as many shares
+    as it pays for after fees. Deposits the strategy does not invest stay in cash, all cash earns growth.
+    With value_averaging the contribution is what brings shares and cash up to goal once the fees are paid"""
+
+    shape = close.shape
+    shares_total = np.zeros(shape)
+    invested_total = np.zeros(shape)
+    cash = np.zeros(shape)
+    fees_total = np.zeros(shape)
+
+    for c in range(shape[0]):
+        shares = invested = carry = reserve = fees = 0.0
+        for i in range(shape[1]):
+            carry *= growth[i]
+            reserve *= growth[i]
+            if value_averaging:
+                missing = goal[c, i] - (shares*close[c, i] + carry) #the cash waiting to be invested counts towards the goal
+                contribution = max((goal[c, i] - shares*close[c, i])*(1 + fee_pct) + fee_fixed - carry, 0.0) if missing > 0 else 0.0
+                deposit = contribution
+            else:
+                contribution, deposit = contributions[c, i], deposits[c, i]
+            invested += deposit
+            reserve += deposit - contribution
+
+            available = contribution + carry
+            budget = available - fee_fixed
+            bought = budget/(close[c, i]*(1 + fee_pct)) if budget > 0 else 0.0
+            if whole_shares:
+                bought = np.floor(bought)
+                carry = available - (bought*close[c, i]*(1 + fee_pct) + fee_fixed) if bought > 0 else available
+            else:
+                carry = 0.0 if bought > 0 else available #a fractional buy spends everything
+            if bought > 0:
+                fees += fee_fixed + bought*close[c, i]*fee_pct
+            shares += bought
+
+            shares_total[c, i] = shares
+            invested_total[c, i] = invested
+            cash[c, i] = carry + reserve
+            fees_total[c, i] = fees
+
+    return shares_total, invested_total, cash, fees_total
+
+
+def fill_results(monthly_investments, contributions, frictions=None, deposits=None, goal=None):
+    """Runs the engine on the Close column of monthly_investments and writes the result columns in place"""
+
+    growth = cash_growth(monthly_investments.index, frictions.get("cash_rate")) if frictions else None
+    results = accumulate(monthly_investments["Close"].to_numpy(), contributions, frictions, deposits, growth, goal)
+
+    for col, values in results.items():
+        monthly_investments[col] = values
+
+    return monthly_investments
+
+
+def value_averaging_goals(n_months: int, goal_monthly_growth, monthly_contrib, start: int = 0):
+    """Target portfolio value of each month for Value Averaging, monthly_contrib*(1+i)*(1+goal_monthly_growth)**i.
+    goal_monthly_growth/monthly_contrib can be arrays (one value per config), returns a (configs x months) array
+    for the months start..n_months-1"""
+
+    goal_monthly_growth, monthly_contrib = np.broadcast_arrays(np.atleast_1d(np.asarray(goal_monthly_growth, dtype=float)),
+                                                               np.atleast_1d(np.asarray(monthly_contrib, dtype=float)))
+    i = np.arange(start, n_months)
+    return monthly_contrib[:, None]*(1+i)*(1+goal_monthly_growth[:, None])**i
+
+
+def value_averaging_contributions(close, goal_monthly_growth=0.006, monthly_contrib=1000, goal=None):
+    """Contributions of the Value Averaging strategy for many configs at once, returns a (configs x months) array.
+    Every month we invest what is missing to reach the goal value (nothing if we are ahead).
+    goal is an optional schedule of target values, (months,) or (configs x months), used instead of the
+    goal_monthly_growth/monthly_contrib formula. close can also have one row per config (e.g. simulated paths).
+
+    The strategy is a recurrence (each month depends on the shares already owned). With numba installed
+    it runs as a compiled loop, otherwise we loop over the months and do every step for all configs together"""
+
+    close = np.asarray(close, dtype=float)
+
+    if goal is None:
+        goal = value_averaging_goals(close.shape[-1], goal_monthly_growth, monthly_contrib)
+    close, goal = np.broadcast_arrays(np.atleast_2d(close), np.atleast_2d(np.asarray(goal, dtype=float)))
+
+    compiled = _jit("va", _va_loop)
+    if compiled is not None:
+        return compiled(np.ascontiguousarray(close), np.ascontiguousarray(goal))
+    return _va_numpy(close, goal)
+
+
+def _va_numpy(close, goal):
+    contributions = np.zeros(goal.shape)
+    shares_total = np.zeros(goal.shape[0])
+
+    for i in range(goal.shape[1]):
+        price = close[:, i]
+        current_val = shares_total*price
+        investment_this_month = np.maximum(goal[:, i] - current_val, 0) #we invest if we are behind target and do nothing if we are on track/ahead
+
+        shares_total += investment_this_month/price
+        contributions[:, i] = investment_this_month
+
+    return contributions
+
+
+def _va_loop(close, goal):
+    contributions = np.zeros(goal.shape)
+
+    for c in range(goal.shape[0]):
+        shares_total = 0.0
+        for i in range(goal.shape[1]):
+            investment_this_month = max(goal[c, i] - shares_total*close[c, i], 0.0)
+            shares_total += investment_this_month/close[c, i]
+            contributions[c, i] = investment_this_month
+
+    return contributions
+
+
+_compiled = {}
+
+def _jit(name, func):
+    """numba version of func, or None when numba is not installed (then the NumPy version is used).
+    numba is only imported the first time a compiled kernel is needed, importing it takes longer than the rest of the package"""
+
+    if name not in _compiled:
+        try:
+            from numba import njit
+            _compiled[name] = njit(cache=True)(func)
+        except ImportError:
+            _compiled[name] = None
+    return _compiled[name]
@@ -0,0 +1,65 @@
+import hashlib
+import pandas as pd
+from .cache import LRUCache
+from .kernels import rolling_max_many
+from .scheduler import sample, schedule_key
+
+_cache = LRUCache(maxsize=256)
+
+
+def fingerprint(df):
+    """Hash of the data (index, columns and values), two frames with the same prices share their indicators"""
+
+    hashed = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    return hashlib.blake2b(hashed.tobytes() + repr(list(df.columns)).encode(), digest_size=16).hexdigest()
+
+
+def _cached(df, indicator, window, compute):
+    return _cache.get_or_compute((fingerprint(df), indicator, window), compute)
+
+
+def rolling_max(df, window: int):
+    """Rolling max of Close over window trading days"""
+
+    return _cached(df, "rolling_max", window,
+                   lambda: pd.Series(rolling_max_many(df["Close"].to_numpy(), [window])[0], index=df.index, name="Close"))
+
+
+def drawdown(df, window: int):
+    """Close relative to its rolling max (1 = at the high, 0.8 = 20% below it)"""
+
+    return _cached(df, "drawdown", window, lambda: df["Close"]/rolling_max(df, window))
+
+
+def sma(df, window: int):
+    """Simple Moving Average of Close over window trading days"""
+
+    return _cached(df, "sma", window, lambda: df["Close"].rolling(window).mean())
+
+
+_DAILY = {"rolling_max": rolling_max, "drawdown": drawdown, "sma": sma}
+
+
+def on_schedule(df, indicator: str, window: int, schedule=None):
+    """Indicator value on the buying days of a schedule (first available value of each period, see scheduler.sample).
+    With the default monthly schedule this is resample("MS").first()"""
+
+    return _cached(df, f"scheduled_{indicator}", (window, schedule_key(schedule)),
+                   lambda: sample(_DAILY[indicator](df, window), schedule))
+
+
+def scheduled(df, schedule=None):
+    """df sampled on the buying days of a schedule, by default the first trading day of each month
+    (returns a copy, callers are free to add columns)"""
+
+    return _cached(df, "scheduled", schedule_key(schedule), lambda: sample(df, schedule)).copy()
+
+
+def cache_stats():
+    """Hit/miss counters of the indicator cache"""
+
+    return _cache.stats()
+
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,106 @@
+import math
+import numpy as np
+
+
+def rolling_max_many(x, windows):
+    """Trailing rolling max of x for several windows at once, returns a (windows x days) array.
+    Same result as pd.Series(x).rolling(w).max() for every w: NaN for the first w-1 days and
+    for windows that contain a NaN. x can also be (paths x days), the result is then (windows x paths x days)
+
+    Uses a sparse table: level k holds the max over the last 2**k days, built with one np.maximum per level.
+    Any window w is then the max of two overlapping level-k blocks (2**k <= w), so every extra window
+    costs one vectorized pass over the data"""
+
+    x = np.asarray(x, dtype=float)
+    windows = np.atleast_1d(np.asarray(windows, dtype=int))
+    n = x.shape[-1]
+
+    levels = [x]
+    while 2**len(levels) <= windows.max():
+        prev, step = levels[-1], 2**(len(levels)-1)
+        level = np.full_like(x, np.nan)
+        level[..., step:] = np.maximum(prev[..., step:], prev[..., :-step]) #max of two adjacent blocks of the previous level
+        levels.append(level)
+
+    out = np.full((len(windows),) + x.shape, np.nan)
+    for j, w in enumerate(windows):
+        if w > n:
+            continue
+        k = int(w).bit_length() - 1
+        level, block = levels[k], 2**k
+        #block ending at day i and block ending at day i-w+block cover exactly [i-w+1, i]
+        out[j, ..., w-1:] = np.maximum(level[..., w-1:], level[..., block-1:n-w+block])
+
+    return out
+
+
+def rolling_min_many(x, windows):
+    """Trailing rolling min for several windows at once, see rolling_max_many"""
+
+    return -rolling_max_many(-np.asarray(x, dtype=float), windows)
+
+
+def sma_many(x, windows):
+    """Simple Moving Averages of x for several windows from one cumulative sum, returns a (windows x days) array.
+    Matches pd.Series(x).rolling(w).mean() up to floating point rounding (~1e-12 relative). x must not contain NaN"""
+
+    x = np.asarray(x, dtype=float)
+    windows = np.atleast_1d(np.asarray(windows, dtype=int))
+    n = x.shape[-1]
+
+    csum = np.zeros(x.shape[:-1] + (n+1,))
+    np.cumsum(x - x[..., :1], axis=-1, out=csum[..., 1:]) #removing the first price keeps the running sum small, so less rounding
+
+    out = np.full((len(windows),) + x.shape, np.nan)
+    for j, w in enumerate(windows):
+        if w > n:
+            continue
+        out[j, ..., w-1:] = (csum[..., w:] - csum[..., :n-w+1])/w + x[..., :1]
+
+    return out
+
+
+def rolling_mean_state():
+    """Running state of rolling_mean_push/rolling_mean_value, plain JSON (see streaming.py)"""
+
+    return {"sum": 0.0, "add_compensation": 0.0, "remove_compensation": 0.0, "nobs": 0, "neg_ct": 0,
+            "same_count": 0, "prev": None}
+
+
+def rolling_mean_push(state, value: float, leaving, window: int):
+    """Adds value to a trailing rolling mean of window values and removes leaving (the value dropping out of the window,
+    None while it is not full). Same arithmetic as pd.Series.rolling(window).mean(), a Kahan sum with separate add/remove
+    compensations, so the mean of every day is bit for bit the one pandas computes over the whole history"""
+
+    if window == 1 or state["prev"] is None: #pandas starts over: first value, or windows that do not overlap
+        state.update(rolling_mean_state(), prev=value)
+    elif leaving is not None:
+        y = -leaving - state["remove_compensation"]
+        t = state["sum"] + y
+        state["remove_compensation"] = t - state["sum"] - y
+        state["sum"] = t
+        state["nobs"] -= 1
+        state["neg_ct"] -= math.copysign(1.0, leaving) < 0
+
+    y = value - state["add_compensation"]
+    t = state["sum"] + y
+    state["add_compensation"] = t - state["sum"] - y
+    state["sum"] = t
+    state["nobs"] += 1
+    state["neg_ct"] += math.copysign(1.0, value) < 0
+    state["same_count"] = state["same_count"] + 1 if value == state["prev"] else 1 #runs of equal values give that value exactly
+    state["prev"] = value
+
+
+def rolling_mean_value(state, min_periods: int):
+    """Mean of the values pushed into state, NaN with fewer than min_periods of them (pandas' calc_mean)"""
+
+    nobs = state["nobs"]
+    if nobs < min_periods or nobs == 0:
+        return math.nan
+    mean = state["sum"]/nobs
+    if state["same_count"] >= nobs:
+        return state["prev"]
+    if (state["neg_ct"] == 0 and mean < 0) or (state["neg_ct"] == nobs and mean > 0):
+        return 0.0
+    return mean
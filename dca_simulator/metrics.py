@@ -1,128 +1,185 @@
 import pandas as pd
 import numpy as np
-import numpy_financial as npf
-
-def compute_KeyMetrics(df):
-    """Computes all Key Metrics at once""" ######improve descrip
-
-    final_value = df["portf_value"].iloc[-1]
-    final_invested = df["invested_total"].iloc[-1]
-    ROI = (final_value/final_invested - 1)*100
+from .profiling import timed
+
+
+def irr_batch(cashflows, times=None, guess: float = 0.1, tol: float = 1e-12, maxiter: int = 100):
+    """Internal Rate of Return of every row of a (configs x periods) cashflow matrix, all rows solved together.
+    times gives when each cashflow happens, shared (periods,) or per row (configs x periods). By default
+    times = 0, 1, 2, ... and the result is the rate per period, like npf.irr. With times in years it is an XIRR.
+    guess can be one starting rate per row.
+    Returns (rates, converged): rows without a root or that did not converge get NaN and converged=False.
+    Rows whose cashflows change sign several times can have several IRRs, one of them is returned (the one closest
+    to guess when the search range has to be scanned, see below).
 
+    Newton steps on x = log(1+r), safeguarded by bisection: every row keeps a bracket around its root and any
+    Newton step that leaves it, or shrinks slower than bisection would, is replaced by the midpoint.
+    Rows drop out of the iteration once converged.
+    The search range is r in [-99.3%, e^20-1] per unit of time (times >= 0), with a lower end closer to 0 for long
+    series so the discount factors cannot overflow. When the NPV has the same sign at both ends (an even number
+    of roots, or none), the range is scanned in steps of 0.1 in log(1+r) for a sign change. Roots closer together
+    than that, and double roots where the NPV only touches 0, are not found: those rows come back NaN"""
+
+    cashflows = np.atleast_2d(np.asarray(cashflows, dtype=float))
+    n_rows, n_periods = cashflows.shape
+    times = np.arange(n_periods, dtype=float) if times is None else np.asarray(times, dtype=float)
+    times = np.broadcast_to(times, cashflows.shape)
 
-    start_date = df.index[0]
-    end_date = df.index[-1]
-    years = (end_date - start_date).days/365 
-    CAGR = ((final_value/final_invested)**(1/years) - 1)*100
-    
+    def npv(rows, x):
+        discounted = cashflows[rows]*np.exp(-x[:, None]*times[rows])
+        return discounted.sum(axis=1), -(times[rows]*discounted).sum(axis=1) #NPV and its derivative in x
 
-    peak = df["portf_value"].cummax() #calc local peak
-    drawdown = df["portf_value"]/peak - 1 #calc drawdown in current period
-    max_drawdown = drawdown.min() * 100
+    #bracket: high rates only shrink the discount factors, low ones grow them, so only the lower end depends on the length
+    lo = -np.minimum(5.0, 460/np.maximum(times.max(axis=1), 1)) #discount factors up to e^460 ~ 1e200, room for big cashflows
+    hi = np.full(n_rows, _IRR_MAX_X)
+    rows = np.arange(n_rows)
+    f_lo, f_hi = npv(rows, lo)[0], npv(rows, hi)[0]
 
+    x = np.clip(np.log1p(guess), lo, hi)
+    active = np.sign(f_lo) != np.sign(f_hi)
+    mixed = (cashflows > 0).any(axis=1) & (cashflows < 0).any(axis=1) #cashflows of one sign never have a root
+    if (~active & mixed).any():
+        _scan_brackets(np.flatnonzero(~active & mixed), npv, x, lo, hi, f_lo, active)
 
-    calmar = CAGR/abs(max_drawdown)
+    converged = np.zeros(n_rows, dtype=bool)
+    step_before = hi - lo
 
+    for _ in range(maxiter):
+        rows = np.flatnonzero(active)
+        if len(rows) == 0:
+            break
 
-    cashflows = []
-    cashflows.append(-df["invested_total"].iloc[0])
-    cashflows.extend(-df["invested_total"].diff().iloc[1:]) #calc cashflows on each date
-    cashflows[-1] += df["portf_value"].iloc[-1] #we liquidate the investment to calc irr
-    cashflows = np.array(cashflows)
-    irr_monthly = npf.irr(cashflows) 
-    irr_annual = ((1+irr_monthly)**12 - 1)*100
+        f, df = npv(rows, x[rows])
+        below = np.sign(f) == np.sign(f_lo[rows]) #the root is above x
+        lo[rows] = np.where(below, x[rows], lo[rows])
+        f_lo[rows] = np.where(below, f, f_lo[rows])
+        hi[rows] = np.where(below, hi[rows], x[rows])
 
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_new = x[rows] - f/df
+        tiny = np.abs(x_new - x[rows]) < tol #converged: rounding can put such a step on the bracket edge, it must not bisect
+        outside = ~((x_new > lo[rows]) & (x_new < hi[rows])) #also True for NaN steps
+        slow = np.abs(2*f) > np.abs(step_before[rows]*df) #Newton is not converging faster than bisection would
+        x_new = np.where((outside | slow) & ~tiny, (lo[rows] + hi[rows])/2, x_new)
+        x_new = np.where(f == 0, x[rows], x_new)
+        step_before[rows] = np.abs(x_new - x[rows])
 
-    return {
-        "Total Invested": f"${final_invested:,.2f}",
-        "Final Value": f"${final_value:,.2f}",
-        "ROI": f"{ROI:,.2f}%",
-        "IRR": f"{irr_annual:,.2f}%",
-        "CAGR": f"{CAGR:,.2f}%",
-        "Max Drawdown": f"{max_drawdown:,.2f}%",
-        "Calmar Ratio": round(calmar, 2),
-        "Years": round(years, 1)
-    }
+        done = (np.abs(x_new - x[rows]) < tol) | (f == 0)
+        x[rows] = x_new
+        converged[rows[done]] = True
+        active[rows[done]] = False
 
+    rates = np.expm1(x)
+    rates[~converged] = np.nan
+    return rates, converged
 
 
+_IRR_MAX_X = 20.0 #log(1+r) at the top of the irr_batch search range
+_IRR_SCAN_STEP = 0.1
 
-#def compute_roi(df):
-    """Computing Return on Investment (%)"""
 
-    final_value = df["portf_value"].iloc[-1]
-    final_invested = df["invested_total"].iloc[-1]
-    ROI = (final_value/final_invested - 1)*100
-    return ROI
+def _scan_brackets(rows, npv, x, lo, hi, f_lo, active):
+    """Looks for sign changes of the NPV on a grid over [lo, hi] of the given rows and narrows their bracket
+    to the change closest to x, in place. Rows where one is found become active"""
 
+    n_points = int(np.ceil((_IRR_MAX_X - lo[rows].min())/_IRR_SCAN_STEP)) + 1
+    grid = np.linspace(lo[rows], hi[rows], n_points, axis=1)
+    values = np.column_stack([npv(rows, grid[:, k])[0] for k in range(n_points)]) #one point at a time keeps the memory at rows x periods
 
+    change = (np.sign(values[:, 1:]) != np.sign(values[:, :-1])) & (values[:, :-1] != 0)
+    distance = np.where(change, np.abs((grid[:, 1:] + grid[:, :-1])/2 - x[rows, None]), np.inf)
+    k = np.argmin(distance, axis=1)
+    found = change.any(axis=1)
 
+    rows, k, at = rows[found], k[found], np.flatnonzero(found)
+    lo[rows], hi[rows], f_lo[rows] = grid[at, k], grid[at, k+1], values[at, k]
+    x[rows] = (lo[rows] + hi[rows])/2
+    active[rows] = True
 
 
-#def compute_cagr(df):
-    """Computing Compound Annual Growth Rate (%) - average growth rate per year"""
-    #the definition below differs slighly from classical CAGR since we are continuosly investing
-    #whereas classic CAGR is calculated as (end_value/start_value - 1)**(1/years)
+def xirr(cashflows, dates, guess: float = 0.1):
+    """Annual Internal Rate of Return of cashflows happening on the given dates (XIRR),
+    the rate r for which sum(cashflow/(1+r)**(days since first date/365)) = 0. Returns NaN when there is no root"""
 
-    start_date = df.index[0]
-    end_date = df.index[-1]
-    years = (end_date - start_date).days/365 
-    final_value = df["portf_value"].iloc[-1]
-    final_invested = df["invested_total"].iloc[-1] 
-    CAGR = ((final_value/final_invested)**(1/years) - 1)*100
-    return CAGR
-    
+    cashflows = np.asarray(cashflows, dtype=float)
+    years = (pd.DatetimeIndex(dates) - pd.Timestamp(dates[0])).days.to_numpy()/365
+
+    keep = cashflows != 0 #months without a cashflow do not change the NPV
+    if keep.sum() < 2:
+        return np.nan
 
+    return irr_batch(cashflows[keep], years[keep], guess=guess)[0][0]
 
-#def compute_max_drawdown(df):
-    """Maximum Drawdown (%) - the largest percentage loss from a peak to a trough in the value of the investment"""
 
-    peak = df["portf_value"].cummax() #calc local peak
-    drawdown = df["portf_value"]/peak - 1 #calc drawdown in current period
-    max_drawdown = drawdown.min() * 100
-    return max_drawdown
-   
 
+@timed()
+def compute_KeyMetrics_batch(dates, invested_total, portf_value):
+    """Numeric version of compute_KeyMetrics for many strategy runs at once.
+    invested_total and portf_value are (configs x periods) arrays that share the same dates,
+    returns a dict of arrays with the same keys as compute_KeyMetrics"""
 
+    invested_total = np.atleast_2d(invested_total)
+    portf_value = np.atleast_2d(portf_value)
 
-#def compute_calmar(df):
-    
-    start_date = df.index[0]
-    end_date = df.index[-1]
-    years = (end_date - start_date).days/365
+    final_value = portf_value[:, -1]
+    final_invested = invested_total[:, -1]
+    years = (dates[-1] - dates[0]).days/365
 
-    final_value = df["portf_value"].iloc[-1]
-    final_invested = df["invested_total"].iloc[-1] 
-    CAGR = ((final_value/final_invested)**(1/years) - 1)*100
+    with np.errstate(divide="ignore", invalid="ignore"): #runs that never invested give NaN instead of raising
+        ROI = (final_value/final_invested - 1)*100
+        CAGR = ((final_value/final_invested)**(1/years) - 1)*100
 
+        peak = np.maximum.accumulate(portf_value, axis=1)
+        drawdown = portf_value/peak - 1
+        max_drawdown = np.fmin.reduce(drawdown, axis=1) * 100 #fmin skips the NaN (0/0) months before the first purchase, like pandas .min()
 
-    peak = df["portf_value"].cummax() 
-    drawdown = df["portf_value"]/peak - 1 
-    max_drawdown = drawdown.min() * 100
+        calmar = CAGR/np.abs(max_drawdown)
 
-    calmar = CAGR/abs(max_drawdown)
-    return calmar
+    cashflows = -np.diff(invested_total, axis=1, prepend=0) #calc cashflows on each date
+    cashflows[:, -1] += final_value #we liquidate the investment to calc irr
+    years_since_start = (pd.DatetimeIndex(dates) - dates[0]).days.to_numpy()/365
+    irr_annual = irr_batch(cashflows, years_since_start)[0]*100 #XIRR of all runs at once, NaN if it has no root
 
+    return {
+        "Total Invested": final_invested,
+        "Final Value": final_value,
+        "ROI": ROI,
+        "IRR": irr_annual,
+        "CAGR": CAGR,
+        "Max Drawdown": max_drawdown,
+        "Calmar Ratio": calmar,
+        "Years": np.full(len(final_value), years)
+    }
 
 
-#def compute_irr(df):
-    """Compute Internal Rate of Return (IRR), the discount rate that makes the PV of all cashflows equal 0"""
 
-    cashflows = []
+@timed()
+def compute_metrics(df):
+    """All Key Metrics of one strategy run as plain numbers (see format_KeyMetrics for the display version)"""
 
-    cashflows.append(-df["invested_total"].iloc[0])
-    cashflows.extend(-df["invested_total"].diff().iloc[1:]) #calc cashflows on each date
+    metrics = compute_KeyMetrics_batch(df.index, df["invested_total"].to_numpy(dtype=float), df["portf_value"].to_numpy(dtype=float))
+    return {name: float(values[0]) for name, values in metrics.items()}
 
-    cashflows[-1] += df["portf_value"].iloc[-1] #we liquidate the investment to calc irr
 
-    cashflows = np.array(cashflows)
 
-    irr_daily = npf.irr(cashflows) 
-    irr_annual = ((1+irr_daily)**365 - 1)*100
-    return irr_annual
+def format_KeyMetrics(metrics):
+    """Presentation of the numbers returned by compute_metrics ($ amounts, percentages, rounding)"""
 
+    return {
+        "Total Invested": f"${metrics['Total Invested']:,.2f}",
+        "Final Value": f"${metrics['Final Value']:,.2f}",
+        "ROI": f"{metrics['ROI']:,.2f}%",
+        "IRR": f"{metrics['IRR']:,.2f}%",
+        "CAGR": f"{metrics['CAGR']:,.2f}%",
+        "Max Drawdown": f"{metrics['Max Drawdown']:,.2f}%",
+        "Calmar Ratio": round(metrics["Calmar Ratio"], 2),
+        "Years": round(metrics["Years"], 1)
+    }
 
 
-#####fix days to 252
 
+@timed()
+def compute_KeyMetrics(df):
+    """Computes all Key Metrics at once, formatted for display"""
 
+    return format_KeyMetrics(compute_metrics(df))
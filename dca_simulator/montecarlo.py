@@ -0,0 +1,146 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from .engine import accumulate
+from .metrics import compute_KeyMetrics_batch
+from .scheduler import buying_days
+from .backtest import _CONTRIBUTIONS, _with_defaults, _expand_grid
+
+
+def log_returns(df):
+    """Daily log returns of the Close prices"""
+
+    return np.diff(np.log(df["Close"].to_numpy(dtype=float)))
+
+
+def block_bootstrap_paths(returns, n_paths: int, n_days: int, start_price: float, block: int = 21, rng=None):
+    """(paths x days) synthetic prices made of randomly chosen blocks of block consecutive historical returns.
+    Blocks keep the short-term autocorrelation and volatility clustering that plain resampling would destroy"""
+
+    rng = np.random.default_rng(rng)
+    block = min(block, len(returns))
+    n_blocks = -(-(n_days-1)//block) #ceil
+
+    starts = rng.integers(0, len(returns) - block + 1, size=(n_paths, n_blocks))
+    sampled = returns[starts[:, :, None] + np.arange(block)].reshape(n_paths, -1)[:, :n_days-1]
+    return _prices(sampled, start_price)
+
+
+def gbm_paths(returns, n_paths: int, n_days: int, start_price: float, rng=None):
+    """(paths x days) Geometric Brownian Motion prices with the drift and volatility of the historical returns"""
+
+    rng = np.random.default_rng(rng)
+    sampled = rng.normal(returns.mean(), returns.std(ddof=1), size=(n_paths, n_days-1))
+    return _prices(sampled, start_price)
+
+
+def _prices(log_returns, start_price):
+    prices = np.empty((log_returns.shape[0], log_returns.shape[1]+1))
+    prices[:, 0] = 0
+    np.cumsum(log_returns, axis=1, out=prices[:, 1:])
+    return start_price*np.exp(prices)
+
+
+_GENERATORS = {"bootstrap": block_bootstrap_paths, "gbm": gbm_paths}
+
+
+
+def simulate(df: pd.DataFrame, strategies: dict, n_paths: int = 1000, method: str = "bootstrap", n_days: int | None = None,
+             block: int = 21, seed=None, chunk_size: int = 250, workers: int = 1, schedule=None):
+    """Runs strategies on n_paths synthetic price paths generated from the returns of df (block bootstrap or GBM).
+    strategies maps a strategy function to its parameters, e.g. {dca_DD: {"monthly_contrib": 100}, lump_sum: {"monthly_contrib": 100}},
+    every strategy runs on the same paths so they can be compared path by path.
+    Paths have n_days trading days (default: as many as df) and are handled chunk_size at a time, so memory does not grow with n_paths.
+    Every chunk gets its own random stream from seed: the same seed and chunk_size give the same paths whatever the number of workers.
+    workers > 1 spreads the chunks over a process pool (spawned, scripts need the if __name__ == "__main__": guard).
+    The parameters can be grids or lists of dicts as in backtest.sweep, every config runs on the same paths.
+    Returns one row of metrics (see compute_KeyMetrics_batch) per (path, config) with the parameters of the config
+    and a Config label ("monthly_contrib=100, DD_threshold=0.1"), see summarize for the distributions"""
+
+    if method not in _GENERATORS:
+        raise ValueError(f"Unknown method '{method}', use one of {list(_GENERATORS)}")
+    for strategy in strategies:
+        if strategy not in _CONTRIBUTIONS:
+            raise ValueError(f"simulate does not support the strategy '{strategy.__name__}'")
+
+    n_days = n_days or len(df)
+    if n_days <= len(df):
+        dates = df.index[:n_days]
+    else:
+        dates = pd.bdate_range(df.index[0], periods=n_days, name=df.index.name) #longer than the history: business days calendar
+
+    configs = [(strategy, config) for strategy, params in strategies.items()
+               for config in _with_defaults(strategy, _expand_grid(params))]
+    if any("schedule" in config or "frictions" in config for _, config in configs):
+        raise ValueError("pass the schedule to simulate(), frictions are not supported")
+    labels, first_day = buying_days(dates, schedule)
+
+    sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    chunks = [(log_returns(df), float(df["Close"].iloc[0]), method, block, n_days, size, stream, configs, labels, first_day)
+              for size, stream in zip(sizes, streams)]
+
+    if workers == 1:
+        tables = [_run_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context("spawn")) as pool:
+            tables = list(pool.map(_run_chunk, chunks))
+
+    offsets = np.cumsum([0] + sizes[:-1])
+    for table, offset in zip(tables, offsets):
+        table["Path"] += offset
+
+    results = pd.concat(tables, ignore_index=True)
+    params = list(dict.fromkeys(name for _, config in configs for name in config))
+    return results[["Path", "Strategy", "Config"] + params + [c for c in results.columns if c not in params and c not in ("Path", "Strategy", "Config")]]
+
+
+def _run_chunk(chunk):
+    """Generates one chunk of paths and runs every strategy on it, returns their metrics rows"""
+
+    returns, start_price, method, block, n_days, size, stream, configs, labels, first_day = chunk
+    rng = np.random.default_rng(stream)
+
+    if method == "bootstrap":
+        paths = block_bootstrap_paths(returns, size, n_days, start_price, block=block, rng=rng)
+    else:
+        paths = gbm_paths(returns, size, n_days, start_price, rng=rng)
+
+    monthly_close = paths[:, first_day]
+    market = {"close": paths, "monthly_close": monthly_close, "first_day": first_day}
+
+    tables = []
+    for strategy, config in configs:
+        columns = {name: np.array([value], dtype=float) for name, value in config.items()}
+
+        #the contribution functions of sweep() broadcast over paths the same way they do over configs
+        contributions = _CONTRIBUTIONS[strategy](market, columns).reshape(-1, monthly_close.shape[1])
+        results = accumulate(monthly_close, np.broadcast_to(contributions, monthly_close.shape))
+        metrics = compute_KeyMetrics_batch(labels, results["invested_total"], results["portf_value"])
+
+        table = pd.DataFrame(metrics)
+        for i, (name, value) in enumerate(config.items()):
+            table.insert(i, name, value)
+        table.insert(0, "Config", ", ".join(f"{name}={value:g}" for name, value in config.items()))
+        table.insert(0, "Strategy", strategy.__name__)
+        table.insert(0, "Path", np.arange(size))
+        tables.append(table)
+
+    return pd.concat(tables, ignore_index=True)
+
+
+
+def summarize(results: pd.DataFrame, percentiles=(5, 25, 50, 75, 95), metrics=("ROI", "IRR", "Max Drawdown")):
+    """Distribution of the metrics of simulate() per config: mean, std and percentiles over the paths"""
+
+    rows = {}
+    for (strategy, config, metric), values in results.melt(id_vars=["Strategy", "Config"], value_vars=list(metrics),
+                                                           var_name="Metric").groupby(["Strategy", "Config", "Metric"], sort=False)["value"]:
+        values = values.to_numpy()
+        row = {"mean": np.nanmean(values), "std": np.nanstd(values)}
+        row.update({f"p{p}": q for p, q in zip(percentiles, np.nanpercentile(values, percentiles))})
+        rows[(strategy, config, metric)] = row
+
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis(["Strategy", "Config", "Metric"])
@@ -1,98 +1,126 @@
-import matplotlib.pyplot as plt
+#chart kind -> (column, title, y label, figure size)
+CHARTS = {
+    "profit_loss": ("profit_loss", "Profit/Loss Comparison", "Profit/Loss ($ million)", (12, 6)),
+    "portf_value": ("portf_value", "Portfolio Value Comparison", "Profit/Loss ($10s million)", (12, 6)),
+    "shares_total": ("shares_total", "Accumulated shares Comparison", "Accumulated shares", (12, 6)),
+    "monthly_investment": ("invested_total", "Invested Amount per month over time", "Invested Amount per month", (12, 3)), #drawn as the monthly difference
+    "invested_total": ("invested_total", "Cumulative Invested Amount  over time", "Invested Total ($)", (12, 3))
+}
 
-def plot_profit_loss(*dfs, labels=None):
-    """Used to plot plofit_loss of different strategies in one graph for comparison"""
 
-    plt.figure(figsize=(12,6))
+def draw(ax, kind: str, dfs, labels=None, max_points: int | None = None):
+    """Draws one chart of CHARTS comparing several strategy results on a matplotlib ax.
+    max_points downsamples longer series (LTTB, see downsample.py) before drawing, e.g. daily schedules"""
 
+    from .downsample import lttb
+
+    column, title, ylabel, _ = CHARTS[kind]
     if labels is None: #if one forgets to specify the label
         labels = [f"Strategy {i+1}" for i in range(len(dfs))]
 
-    for  i, df in enumerate(dfs):
-        plt.plot(df.index, df["profit_loss"], label = labels[i])
+    for df, label in zip(dfs, labels):
+        x = df.index
+        y = df[column].diff() if kind == "monthly_investment" else df[column]
+        if max_points is not None and len(x) > max_points:
+            keep = lttb(x.asi8, y.to_numpy(dtype=float), max_points)
+            x, y = x[keep], y.iloc[keep]
+        ax.plot(x, y, label=label)
 
-    plt.title("Profit/Loss Comparison")
-    plt.xlabel("Date")
-    plt.ylabel("Profit/Loss ($ million)")
-    plt.grid(False)
-    plt.legend()
-    plt.show()
+    ax.set_title(title)
+    ax.set_xlabel("Date")
+    ax.set_ylabel(ylabel)
+    ax.grid(False)
+    ax.legend()
 
 
-def plot_portf_value(*dfs, labels=None):
-    """Used to plot portf_value of different strategies in one graph for comparison"""
+def _plot(kind, dfs, labels, ax, show, max_points):
+    """Draws on ax when given, otherwise on a new figure: shown with pyplot, or returned when show=False.
+    The returned figures are not managed by pyplot (no GUI backend, nothing kept alive), they go away with their last reference"""
 
-    plt.figure(figsize=(12,6))
+    if ax is not None:
+        draw(ax, kind, dfs, labels, max_points)
+        return ax.figure
 
-    if labels is None: #if one forgets to specify the label
-        labels = [f"Strategy {i+1}" for i in range(len(dfs))]
+    if not show:
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=CHARTS[kind][3])
+        draw(fig.add_subplot(), kind, dfs, labels, max_points)
+        return fig
+
+    import matplotlib.pyplot as plt #imported on first use, matplotlib is slow to import
 
-    for i, df in enumerate(dfs):
-        plt.plot(df.index, df["portf_value"], label=labels[i])
+    plt.figure(figsize=CHARTS[kind][3])
+    draw(plt.gca(), kind, dfs, labels, max_points)
+    plt.show()
 
-    plt.title("Portfolio Value Comparison")
-    plt.xlabel("Date")
-    plt.ylabel("Profit/Loss ($10s million)")
-    plt.grid(False)
-    plt.legend()
-    plt.show()  
 
+def plot_profit_loss(*dfs, labels=None, ax=None, show=True, max_points=None):
+    """Used to plot plofit_loss of different strategies in one graph for comparison.
+    ax: draw on these axes instead, show=False: return the figure instead of showing it (see _plot)"""
 
-def plot_shares_total(*dfs, labels=None):
-    """Used to plot shares_total of different strategies in one graph for comparison"""
+    return _plot("profit_loss", dfs, labels, ax, show, max_points)
 
-    plt.figure(figsize=(12,6))
 
-    if labels is None: #if one forgets to specify the label
-        labels = [f"Strategy {i+1}" for i in range(len(dfs))]
+def plot_portf_value(*dfs, labels=None, ax=None, show=True, max_points=None):
+    """Used to plot portf_value of different strategies in one graph for comparison"""
 
-    for  i, df in enumerate(dfs):
-        plt.plot(df.index, df["shares_total"], label = labels[i])
+    return _plot("portf_value", dfs, labels, ax, show, max_points)
 
-    plt.title("Accumulated shares Comparison")
-    plt.xlabel("Date")
-    plt.ylabel("Accumulated shares")
-    plt.grid(False)
-    plt.legend()
-    plt.show()
 
+def plot_shares_total(*dfs, labels=None, ax=None, show=True, max_points=None):
+    """Used to plot shares_total of different strategies in one graph for comparison"""
+
+    return _plot("shares_total", dfs, labels, ax, show, max_points)
 
 
-def plot_monthly_investment(*dfs, labels=None):
+def plot_monthly_investment(*dfs, labels=None, ax=None, show=True, max_points=None):
     """Used to plot monthly_investment of different strategies in one graph for comparison"""
 
-    plt.figure(figsize=(12,3))
+    return _plot("monthly_investment", dfs, labels, ax, show, max_points)
 
-    if labels is None: #if one forgets to specify the label
-        labels = [f"Strategy {i+1}" for i in range(len(dfs))]
 
-    for  i, df in enumerate(dfs):
-        invested_monthly = df["invested_total"].diff()
-        plt.plot(df.index, invested_monthly, label = labels[i])
+def plot_invested_total(*dfs, labels=None, ax=None, show=True, max_points=None):
+    """Used to plot cumulative invested_total of different strategies in one graph for comparison"""
 
-    plt.title("Invested Amount per month over time")
-    plt.xlabel("Date")
-    plt.ylabel("Invested Amount per month")
-    plt.grid(False)
-    plt.legend()
-    plt.show()
+    return _plot("invested_total", dfs, labels, ax, show, max_points)
 
 
 
-def plot_invested_total(*dfs, labels=None):
-    """Used to plot cumulative invested_total of different strategies in one graph for comparison"""
+class ChartRenderer:
+    """Renders CHARTS to image files without any GUI: one Agg figure per figure size, cleared and reused
+    for every chart, so rendering hundreds of charts does not create hundreds of figures.
+    close() (or the with block) releases the figures"""
 
-    plt.figure(figsize=(12,3))
+    def __init__(self, dpi: int = 100):
+        self.dpi = dpi
+        self._figures = {}
 
-    if labels is None: #if one forgets to specify the label
-        labels = [f"Strategy {i+1}" for i in range(len(dfs))]
+    def render(self, kind: str, dfs, path, labels=None, max_points: int | None = None):
+        """Draws one chart and writes it to path, the format comes from the extension (.png, .svg, .pdf...)"""
+
+        figsize = CHARTS[kind][3]
+        fig = self._figures.get(figsize)
+        if fig is None:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            fig = Figure(figsize=figsize, dpi=self.dpi)
+            FigureCanvasAgg(fig)
+            self._figures[figsize] = fig
+
+        try:
+            draw(fig.add_subplot(), kind, dfs, labels, max_points)
+            fig.savefig(path)
+        finally:
+            fig.clear() #drops the artists and their data, the figure itself is reused
+        return path
+
+    def close(self):
+        for fig in self._figures.values():
+            fig.clear()
+        self._figures.clear()
 
-    for  i, df in enumerate(dfs):
-        plt.plot(df.index, df["invested_total"], label = labels[i])
+    def __enter__(self):
+        return self
 
-    plt.title("Cumulative Invested Amount  over time")
-    plt.xlabel("Date")
-    plt.ylabel("Invested Total ($)")
-    plt.grid(False)
-    plt.legend()
-    plt.show()
\ No newline at end of file
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from .data_loader import load_price_data
+from .engine import accumulate_portfolio
+from .scheduler import buying_days, sample
+
+
+def price_matrix(prices: dict):
+    """(dates x assets) Close matrix from several load_price_data frames, e.g. {"SPY": spy_df, "AGG": agg_df}.
+    Only the days where every asset has a price are kept"""
+
+    matrix = pd.concat({name: df["Close"] for name, df in prices.items()}, axis=1, join="inner").dropna()
+    matrix.index.name = "Date"
+    return matrix.sort_index()
+
+
+def load_price_matrix(tickers, start_date: str, end_date: str | None = None, **loader_kwargs):
+    """Loads every ticker with load_price_data (and its cache) and aligns them with price_matrix"""
+
+    prices = {}
+    for ticker in tickers:
+        df = load_price_data(ticker, start_date, end_date, **loader_kwargs)
+        if df.empty:
+            raise ValueError(f"No data found for ticker '{ticker}'.")
+        prices[ticker.upper().strip()] = df
+    return price_matrix(prices)
+
+
+def parse_weights(text: str):
+    """Weights typed as "SPY:0.6, AGG:0.4" (or percentages, "SPY:60, AGG:40") -> {"SPY": 0.6, "AGG": 0.4}.
+    Raises ValueError for an entry without ticker or weight, a ticker listed twice or negative weights"""
+
+    weights = {}
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        ticker, _, weight = item.partition(":")
+        ticker = ticker.upper().strip()
+        if not ticker or not weight.strip():
+            raise ValueError(f"Invalid weight '{item.strip()}', use TICKER:weight, e.g. SPY:60")
+        if ticker in weights:
+            raise ValueError(f"'{ticker}' is listed twice")
+        try:
+            weights[ticker] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid weight '{weight.strip()}' for '{ticker}'") from None
+        if not weights[ticker] >= 0: #also rejects NaN
+            raise ValueError(f"The weight of '{ticker}' must be non-negative, got {weight.strip()}")
+
+    total = sum(weights.values())
+    if weights and not 0 < total < float("inf"):
+        raise ValueError(f"The weights must have a positive sum, got {total}")
+    return {ticker: weight/total for ticker, weight in weights.items()}
+
+
+
+def portfolio_dca(prices: pd.DataFrame, weights, monthly_contrib: float, rebalance=None, drift_threshold: float | None = None,
+                  schedule=None):
+    """Dollar-Cost Averaging into a target-weight portfolio (e.g. 60/40), prices being a (dates x assets) Close matrix
+    (see price_matrix). Every contribution is split by weights, a dict asset -> weight summing to 1.
+    rebalance: schedule of the rebalancings ("quarterly", "YS", a list of dates... see scheduler.buying_days),
+    done on the first buying day of each of its periods. Default: never.
+    drift_threshold: also rebalance when a weight is that far from its target (0.05 = 5 percentage points).
+    schedule: when we buy, as for the single-asset strategies. Default: first trading day of each month
+    Returns the totals (invested_total, portf_value, profit_loss, so compute_KeyMetrics takes it), rebalanced, turnover
+    and the shares_<asset>/value_<asset> columns of every asset"""
+
+    weights = pd.Series(weights, dtype=float)
+    missing = weights.index.difference(prices.columns)
+    if len(missing):
+        raise ValueError(f"No prices for {list(missing)}")
+    if (weights < 0).any() or not np.isclose(weights.sum(), 1):
+        raise ValueError(f"weights must be non-negative and sum to 1, got {weights.to_dict()}")
+
+    prices = prices[weights.index]
+    scheduled = sample(prices, schedule) #close of every asset on the buying days
+    first_day = buying_days(prices.index, schedule)[1]
+    close = scheduled.to_numpy(dtype=float).T #(assets x periods), time on the last axis like the engine
+
+    calendar = None
+    if rebalance is not None:
+        rebalance_days = buying_days(prices.index, rebalance)[1]
+        periods = np.searchsorted(first_day, rebalance_days) #first purchase on or after each rebalancing day
+        calendar = np.zeros(len(first_day), dtype=bool)
+        calendar[periods[(periods > 0) & (periods < len(first_day))]] = True #the first purchase is already on target
+
+    contributions = np.full(len(first_day), monthly_contrib, dtype=float)
+    results = accumulate_portfolio(close, contributions, weights.to_numpy(), calendar, drift_threshold)
+
+    columns = {name: results[name] for name in ("invested_total", "portf_value", "profit_loss", "rebalanced", "turnover")}
+    for k, asset in enumerate(weights.index):
+        columns[f"shares_{asset}"] = results["shares"][k]
+        columns[f"value_{asset}"] = results["values"][k]
+
+    return pd.DataFrame(columns, index=scheduled.index)
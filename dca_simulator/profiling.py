@@ -0,0 +1,162 @@
+import os
+import time
+import json
+import threading
+import inspect
+import functools
+import contextlib
+import tracemalloc
+
+#off by default, DCA_PROFILE=1 turns it on at import (DCA_PROFILE=alloc also tracks the allocations)
+_enabled = False
+_stats = {} #stage -> [calls, total seconds, max seconds, allocated bytes]
+_lock = threading.Lock()
+_NULL = contextlib.nullcontext()
+
+
+def enable(allocations: bool = False):
+    """Starts recording the stages. allocations=True also records the memory allocated by each stage with tracemalloc,
+    which makes everything several times slower: use it to find memory hogs, not for timings"""
+
+    global _enabled
+    if allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+class _Stage:
+    __slots__ = ("name", "start", "memory")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        allocated = tracemalloc.get_traced_memory()[0] - self.memory if self.memory is not None and tracemalloc.is_tracing() else 0
+        with _lock:
+            row = _stats.setdefault(self.name, [0, 0.0, 0.0, 0])
+            row[0] += 1
+            row[1] += elapsed
+            row[2] = max(row[2], elapsed)
+            row[3] += allocated
+        return False
+
+
+def stage(name: str):
+    """Context manager recording the wall time (and allocations) of a block under name, e.g.
+    with profiling.stage("data_loader.csv_parse"): ...
+    Stages can be nested, each one is recorded on its own. Does nothing when profiling is off"""
+
+    if not _enabled:
+        return _NULL
+    return _Stage(name)
+
+
+def timed(name: str | None = None):
+    """Decorator recording every call of a function as a stage (default name: module.function).
+    Coroutine functions are timed until they return, awaits included.
+    When profiling is off the only cost is one flag check per call"""
+
+    def decorate(func):
+        stage_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                with _Stage(stage_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+
+def snapshot():
+    """Copy of the counters: stage -> {calls, seconds, max_seconds, alloc_bytes}"""
+
+    with _lock:
+        return {name: {"calls": calls, "seconds": seconds, "max_seconds": max_seconds, "alloc_bytes": alloc}
+                for name, (calls, seconds, max_seconds, alloc) in _stats.items()}
+
+
+def diff(before, after):
+    """What happened between two snapshots, e.g. one dashboard run (the max is the one of the whole period)"""
+
+    out = {}
+    for name, row in after.items():
+        old = before.get(name, {"calls": 0, "seconds": 0.0, "alloc_bytes": 0})
+        if row["calls"] > old["calls"]:
+            out[name] = {"calls": row["calls"] - old["calls"], "seconds": row["seconds"] - old["seconds"],
+                         "max_seconds": row["max_seconds"], "alloc_bytes": row["alloc_bytes"] - old["alloc_bytes"]}
+    return out
+
+
+def table(stats=None):
+    """Counters as a DataFrame sorted by total time, for display"""
+
+    import pandas as pd
+
+    stats = snapshot() if stats is None else stats
+    df = pd.DataFrame.from_dict(stats, orient="index", columns=["calls", "seconds", "max_seconds", "alloc_bytes"])
+    df["mean_ms"] = df["seconds"]/df["calls"]*1000
+    df = df.rename_axis("Stage").sort_values("seconds", ascending=False)
+    return pd.DataFrame({"Calls": df["calls"], "Total (ms)": (df["seconds"]*1000).round(2), "Mean (ms)": df["mean_ms"].round(2),
+                         "Max (ms)": (df["max_seconds"]*1000).round(2), "Allocated (kB)": (df["alloc_bytes"]/1024).round(1)})
+
+
+def to_json(stats=None, **fields):
+    """One structured log line (JSON) with the stages and any extra fields, e.g. to_json(run="AAPL")"""
+
+    stats = snapshot() if stats is None else stats
+    return json.dumps({"time": time.time(), **fields, "stages": [{"stage": name, **row} for name, row in stats.items()]})
+
+
+def to_prometheus(stats=None, prefix: str = "dca"):
+    """Counters in the Prometheus text exposition format"""
+
+    stats = snapshot() if stats is None else stats
+    metrics = [("stage_calls_total", "calls", "counter", "Number of calls of each stage"),
+               ("stage_seconds_total", "seconds", "counter", "Wall time spent in each stage"),
+               ("stage_max_seconds", "max_seconds", "gauge", "Longest call of each stage"),
+               ("stage_alloc_net_bytes", "alloc_bytes", "gauge", "Net bytes allocated by each stage, negative when it frees more (when tracked)")]
+
+    lines = []
+    for metric, key, kind, help_text in metrics:
+        lines += [f"# HELP {prefix}_{metric} {help_text}", f"# TYPE {prefix}_{metric} {kind}"]
+        lines += [f'{prefix}_{metric}{{stage="{name}"}} {row[key]}' for name, row in sorted(stats.items())]
+    return "\n".join(lines) + "\n"
+
+
+
+if os.environ.get("DCA_PROFILE", "0") not in ("", "0"):
+    enable(allocations=os.environ["DCA_PROFILE"] == "alloc")
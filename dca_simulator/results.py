@@ -0,0 +1,106 @@
+import hashlib
+import weakref
+import numpy as np
+import pandas as pd
+
+#columns stored by a result, portf_value and profit_loss are recomputed from them like the engine does.
+#The indicator columns (12m_high, sma, DD_cond...) are dropped unless asked for
+STATE_COLUMNS = ("shares_total", "invested_total", "cash", "fees_total")
+
+#dates and closes of the results alive, results of the same prices and schedule share them
+_markets = weakref.WeakValueDictionary()
+
+
+class _Market:
+    __slots__ = ("dates", "close", "__weakref__")
+
+    def __init__(self, dates, close):
+        self.dates = dates
+        self.close = close
+
+
+def _shared_market(dates, close):
+    key = hashlib.blake2b(dates.tobytes() + close.tobytes() + str(close.dtype).encode(), digest_size=16).digest()
+    market = _markets.get(key)
+    if market is None:
+        market = _Market(dates, close)
+        _markets[key] = market
+    return market
+
+
+
+class BacktestResult:
+    """Compact version of the frame returned by a strategy, for results kept in memory (caches, sweeps).
+    Holds one contiguous (columns x periods) array with the running state (shares_total, invested_total and,
+    with frictions, cash and fees_total), float64 or float32. The dates and the Close prices are shared by all the
+    results of the same prices and schedule, portf_value and profit_loss are recomputed when read
+    (bit for bit the strategy columns in float64).
+
+    It can be used where the strategy frame is read: result.index and result["portf_value"] give the usual
+    DatetimeIndex/Series, so compute_metrics and the plots.py helpers take it as is. to_frame() builds the full
+    DataFrame when one is really needed (e.g. hvplot)"""
+
+    __slots__ = ("market", "columns", "values")
+
+    def __init__(self, dates, close, columns, values):
+        self.market = _shared_market(dates, close)
+        self.columns = tuple(columns)
+        self.values = values
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, float32: bool = False, extra=()):
+        """Converts a strategy frame, extra names indicator columns to keep as well.
+        float32 halves the memory again, at ~7 significant digits"""
+
+        dtype = np.float32 if float32 else np.float64
+        columns = [col for col in STATE_COLUMNS if col in df.columns] + [col for col in extra if col not in STATE_COLUMNS]
+        values = np.ascontiguousarray(df[columns].to_numpy(dtype=dtype).T)
+        return cls(df.index.to_numpy(), df["Close"].to_numpy(dtype=dtype), columns, values)
+
+    @property
+    def dates(self):
+        return self.market.dates
+
+    @property
+    def index(self):
+        return pd.DatetimeIndex(self.dates, name="Date")
+
+    @property
+    def nbytes(self):
+        """Bytes held by this result only, without the shared dates and closes"""
+
+        return self.values.nbytes
+
+    def column(self, name: str):
+        """One column as a NumPy array, a view of the stored values except for the recomputed ones"""
+
+        if name == "Close":
+            return self.market.close
+        if name == "portf_value":
+            value = self.column("shares_total")*self.market.close
+            return value + self.column("cash") if "cash" in self.columns else value
+        if name == "profit_loss":
+            return self.column("portf_value") - self.column("invested_total")
+        try:
+            return self.values[self.columns.index(name)]
+        except ValueError:
+            raise KeyError(name) from None
+
+    def __getitem__(self, name: str):
+        return pd.Series(self.column(name), index=self.index, name=name)
+
+    def __contains__(self, name):
+        return name in self.columns or name in ("Close", "portf_value", "profit_loss")
+
+    def __len__(self):
+        return len(self.dates)
+
+    def to_frame(self):
+        """The result as a DataFrame with the columns of the strategy output (minus the dropped indicators)"""
+
+        names = ["Close", "shares_total", "invested_total", "portf_value", "profit_loss",
+                 *(col for col in self.columns if col not in ("shares_total", "invested_total"))]
+        return pd.DataFrame({name: self.column(name) for name in names}, index=self.index)
+
+    def __repr__(self):
+        return f"BacktestResult({len(self)} periods, columns={list(self.columns)}, {self.values.dtype}, {self.nbytes:,} bytes)"
@@ -0,0 +1,209 @@
+import os
+import numpy as np
+from pathlib import Path
+import pandas as pd
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from .data_loader import load_price_data
+from .metrics import compute_metrics
+from .plots import CHARTS, ChartRenderer
+
+
+def load_panel(tickers, start_date: str, end_date: str | None = None, loader=load_price_data):
+    """Loads the Close prices of several tickers into one (dates x tickers) frame, NaN where a ticker has no data"""
+
+    closes = {}
+    for ticker in tickers:
+        df = loader(ticker, start_date, end_date)
+        if not df.empty:
+            closes[ticker.upper().strip()] = df["Close"]
+
+    return pd.DataFrame(closes).sort_index()
+
+
+
+class SharedPanel:
+    """Price panel stored in shared memory so worker processes can read it without copying/pickling it.
+    Only the small spec (segment names, shape, tickers) travels to the workers"""
+
+    def __init__(self, spec, dates_shm, values_shm):
+        self.spec = spec
+        self._dates_shm = dates_shm
+        self._values_shm = values_shm
+        self.dates = np.ndarray((spec["n_dates"],), dtype="datetime64[ns]", buffer=dates_shm.buf)
+        self.values = np.ndarray((spec["n_dates"], len(spec["tickers"])), dtype=np.float64, buffer=values_shm.buf)
+
+    @classmethod
+    def create(cls, panel: pd.DataFrame):
+        """Copies a (dates x tickers) frame into two new shared memory segments"""
+
+        n_dates, n_tickers = panel.shape
+        dates_shm = shared_memory.SharedMemory(create=True, size=max(n_dates*8, 1))
+        values_shm = shared_memory.SharedMemory(create=True, size=max(n_dates*n_tickers*8, 1))
+
+        spec = {"dates": dates_shm.name, "values": values_shm.name,
+                "n_dates": n_dates, "tickers": list(panel.columns)}
+
+        shared = cls(spec, dates_shm, values_shm)
+        shared.dates[:] = panel.index.to_numpy(dtype="datetime64[ns]")
+        shared.values[:] = panel.to_numpy(dtype=np.float64)
+        return shared
+
+    @classmethod
+    def attach(cls, spec):
+        """Opens the segments created by another process (read by the workers)"""
+
+        dates_shm = shared_memory.SharedMemory(name=spec["dates"])
+        values_shm = shared_memory.SharedMemory(name=spec["values"])
+        return cls(spec, dates_shm, values_shm)
+
+    def close_prices(self, ticker_idx: int):
+        """Close prices of one ticker as the usual one-column frame expected by the strategies"""
+
+        values = self.values[:, ticker_idx]
+        has_data = ~np.isnan(values)
+        index = pd.DatetimeIndex(self.dates[has_data], name="Date")
+        return pd.DataFrame({"Close": values[has_data]}, index=index) #boolean indexing copies, so the frame never points into shared memory
+
+    def close(self):
+        self.dates = self.values = None
+        self._dates_shm.close()
+        self._values_shm.close()
+
+    def unlink(self):
+        self._dates_shm.unlink()
+        self._values_shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        self.unlink()
+
+
+
+_worker_panel = None
+
+def _init_worker(spec):
+    global _worker_panel
+    _worker_panel = SharedPanel.attach(spec)
+
+
+def _run_job(job):
+    """Runs one (ticker, strategy) job against the panel of the current process and returns its metrics row.
+    When the job has an output path the result series are written there (.parquet or .csv) by the worker itself"""
+
+    ticker_idx, label, strategy, strategy_kwargs, output = job
+    df = _worker_panel.close_prices(ticker_idx)
+
+    row = {"Ticker": _worker_panel.spec["tickers"][ticker_idx], "Strategy": label}
+    try:
+        result = strategy(df, **strategy_kwargs)
+        row.update(compute_metrics(result))
+        if output is not None:
+            write_table(result, output)
+    except Exception as e:
+        row["Error"] = str(e) #one broken ticker should not kill the whole nightly run
+
+    return row
+
+
+_worker_renderer = None
+
+def _render_job(job):
+    """Runs every strategy on one ticker of the panel and renders their comparison charts to out_dir/<ticker>_<chart>.<fmt>.
+    The Agg figures of the process are reused from one job to the next"""
+
+    global _worker_renderer
+    ticker_idx, strategies, charts, out_dir, fmt, max_points = job
+    ticker = _worker_panel.spec["tickers"][ticker_idx]
+    df = _worker_panel.close_prices(ticker_idx)
+
+    if _worker_renderer is None:
+        _worker_renderer = ChartRenderer()
+
+    row = {"Ticker": ticker, "Charts": 0}
+    try:
+        results = [strategy(df, **strategy_kwargs) for strategy, strategy_kwargs in strategies.values()]
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for kind in charts:
+            _worker_renderer.render(kind, results, out_dir / f"{ticker}_{kind}.{fmt}", labels=list(strategies), max_points=max_points)
+            row["Charts"] += 1
+    except Exception as e:
+        row["Error"] = str(e)
+
+    return row
+
+
+def write_table(df, path):
+    """Writes a frame as Parquet or CSV depending on the file extension"""
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".parquet":
+        df.to_parquet(path)
+    else:
+        df.to_csv(path)
+
+
+def iter_jobs(panel: pd.DataFrame, jobs, workers: int | None = None, run=_run_job):
+    """Runs (ticker index, label, strategy, kwargs, output path or None) jobs on a (dates x tickers) panel
+    and yields their metrics rows in job order, as soon as they are available.
+    The panel is placed in shared memory once and the jobs are spread over a process pool,
+    workers=1 runs everything in the current process. The workers are spawned (not forked), so scripts calling
+    this need the usual if __name__ == "__main__": guard. run is the job function (top level, so it can be pickled)"""
+
+    workers = workers or os.cpu_count()
+
+    global _worker_panel
+    with SharedPanel.create(panel) as shared:
+        if workers == 1:
+            _worker_panel = shared
+            try:
+                for job in jobs:
+                    yield run(job)
+            finally:
+                _worker_panel = None
+        else:
+            chunksize = max(1, len(jobs)//(workers*4)) #few big chunks keep the inter-process traffic low
+            #spawn: forked workers would inherit the open network handles of yfinance and crash when they are freed
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(shared.spec,)) as pool:
+                yield from pool.map(run, jobs, chunksize=chunksize)
+
+
+def run_universe(panel: pd.DataFrame, strategies: dict, workers: int | None = None):
+    """Backtests every strategy on every ticker of a (dates x tickers) panel, e.g. from load_panel.
+    strategies maps a label to (strategy, kwargs), e.g. {"DCA": (dca_standard, {"monthly_contrib": 150})}.
+    Jobs run in parallel, see iter_jobs. Returns one metrics row per (ticker, strategy)"""
+
+    jobs = [(j, label, strategy, strategy_kwargs, None)
+            for j in range(panel.shape[1])
+            for label, (strategy, strategy_kwargs) in strategies.items()]
+
+    rows = list(iter_jobs(panel, jobs, workers))
+    return pd.DataFrame(rows).set_index(["Ticker", "Strategy"])
+
+
+
+def render_universe(panel: pd.DataFrame, strategies: dict, out_dir, charts=tuple(CHARTS), fmt: str = "png",
+                    workers: int | None = None, max_points: int | None = None):
+    """Renders the strategy comparison charts of every ticker of a (dates x tickers) panel to PNG/SVG files,
+    out_dir/<ticker>_<chart>.<fmt> for every chart of plots.CHARTS in charts. strategies is as in run_universe.
+    Runs headless in parallel like run_universe, max_points downsamples long series before drawing.
+    Returns one row per ticker with the number of charts written (and the error if it failed)"""
+
+    global _worker_renderer
+    jobs = [(j, strategies, list(charts), str(out_dir), fmt, max_points) for j in range(panel.shape[1])]
+
+    try:
+        rows = list(iter_jobs(panel, jobs, workers, run=_render_job))
+    finally:
+        if _worker_renderer is not None: #workers=1 rendered in this process
+            _worker_renderer.close()
+            _worker_renderer = None
+
+    return pd.DataFrame(rows).set_index("Ticker")
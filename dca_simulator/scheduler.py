@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+#named schedules, any other pandas frequency string (e.g. "QS", "3W-FRI") can be used as well
+FREQUENCIES = {
+    "daily": "D",
+    "weekly": "W-MON",
+    "biweekly": "2W-MON",
+    "monthly": "MS",
+    "quarterly": "QS"
+}
+
+
+def buying_days(index, schedule=None):
+    """Maps a contribution schedule onto trading days with one searchsorted over the sorted daily index.
+    schedule is a name of FREQUENCIES, a pandas frequency string or a list of dates (e.g. payroll dates),
+    None is the usual first trading day of each month.
+    Returns (labels, positions): a DatetimeIndex with the start of every period (or the given date) and the
+    position in index of the first trading day on or after it, where we buy.
+    Periods without any trading day are dropped, dates mapping to the same trading day are bought once"""
+
+    index = pd.DatetimeIndex(index)
+    n = len(index)
+    if n == 0:
+        return pd.DatetimeIndex([], name=index.name), np.array([], dtype=np.intp)
+
+    if schedule is None or isinstance(schedule, str):
+        offset = to_offset(FREQUENCIES.get(schedule or "monthly", schedule or "monthly"))
+        labels = pd.date_range(offset.rollback(index[0].normalize()), index[-1], freq=offset, name=index.name)
+    else:
+        labels = pd.DatetimeIndex(schedule).normalize().unique().sort_values().rename(index.name)
+
+    positions = np.searchsorted(index, labels, side="left")
+    keep = positions < np.append(positions[1:], n) #a period has a trading day when the next one starts later
+
+    if keep.all():
+        return labels, positions #keeps the freq of the labels, like resample
+    return labels[keep], positions[keep]
+
+
+def sample(data, schedule=None):
+    """Series/DataFrame with a daily DatetimeIndex sampled on the buying days of a schedule.
+    Every row holds the first non-NaN value of its period (from its buying day to the next one),
+    for the monthly schedule that is exactly data.resample("MS").first()"""
+
+    labels, positions = buying_days(data.index, schedule)
+
+    if isinstance(data, pd.Series):
+        return pd.Series(_first_valid(data.to_numpy(), positions), index=labels, name=data.name)
+
+    return pd.DataFrame({col: _first_valid(data[col].to_numpy(), positions) for col in data.columns}, index=labels)
+
+
+def schedule_key(schedule):
+    """Hashable version of a schedule, for the caches"""
+
+    if schedule is None or isinstance(schedule, str):
+        return schedule
+    return tuple(pd.DatetimeIndex(schedule).normalize().asi8)
+
+
+def _first_valid(values, positions):
+    """values at the first non-NaN position of each [positions[k], positions[k+1]) range, NaN when there is none"""
+
+    if values.dtype.kind != "f":
+        return values[positions] #bool/int columns have no NaN
+
+    n = len(values)
+    candidates = np.where(np.isnan(values), n, np.arange(n))
+    next_valid = np.minimum.accumulate(candidates[::-1])[::-1] #first non-NaN position at or after every day
+
+    found = next_valid[positions]
+    ok = found < np.append(positions[1:], n)
+
+    out = np.full(len(positions), np.nan)
+    out[ok] = values[found[ok]]
+    return out
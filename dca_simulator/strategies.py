@@ -1,92 +1,73 @@
-import pandas as pd
+import numpy as np
+from .engine import fill_results, value_averaging_contributions, value_averaging_goals
+from . import indicators
+from .scheduler import sample
+from .profiling import timed
 
 
-def dca_DD(df, monthly_contrib: float, DD_threshold: float=0.15):
+@timed()
+def dca_DD(df, monthly_contrib: float, DD_threshold: float=0.15, schedule=None, frictions=None):
     """Double Down Dollar-Cost Averaging (DD_DCA): Investing monthly_contrib, 
     unless the price is 15% below the rolling 1-year high,
     then invest 2x monthly_contrib"""
 
-    df = df.copy()
+    monthly_investments = indicators.scheduled(df, schedule) #because if we specify an exact date manually it could be a non-trading day
+    #we buy at the first trading day of each month (or of each period of schedule, see scheduler.buying_days)
 
-    df["12m_high"] = df["Close"].rolling(252).max() #252 trading days in a year
-    df["drawdown"] = df["Close"]/df["12m_high"]
-    df["DD_cond"] = df["drawdown"] <= (1-DD_threshold) #This is True when the stock is >=20% down from 12m_high
+    #rolling high/drawdown come from the shared indicator cache
+    monthly_investments["12m_high"] = indicators.on_schedule(df, "rolling_max", 252, schedule) #252 trading days in a year
+    monthly_investments["drawdown"] = indicators.on_schedule(df, "drawdown", 252, schedule)
+    DD_cond = indicators.drawdown(df, 252) <= (1-DD_threshold) #This is True when the stock is >=20% down from 12m_high
+    monthly_investments["DD_cond"] = sample(DD_cond, schedule)
 
-    
-
-    monthly_investments = df.resample("MS").first() #because if we specify an exact date manually it could be a non-trading day
-    #we buy at the first trading day of each month
-    monthly_investments["DD_cond"] = df["DD_cond"].resample("MS").first()
-
-
-    shares_total = 0
-    invested_total = 0
-
-    for date, row in monthly_investments.iterrows():
-        multiplier = 2 if row["DD_cond"] else 1
-        investment_amount = monthly_contrib * multiplier
-        #doubling the contribution every time the price drops 20% from rolling high
 
-        shares_bought = investment_amount/row["Close"]
-        shares_total += shares_bought
-        invested_total += investment_amount
+    multiplier = np.where(monthly_investments["DD_cond"].to_numpy(), 2, 1)
+    contributions = monthly_contrib*multiplier
+    #doubling the contribution every time the price drops 20% from rolling high
 
-        monthly_investments.loc[date, 'shares_total'] = shares_total
-        monthly_investments.loc[date, 'invested_total'] = invested_total
-        monthly_investments.loc[date, 'portf_value'] = shares_total * row['Close']
-
-
-    #Profit/Loss
-    monthly_investments['profit_loss'] = monthly_investments['portf_value'] - monthly_investments['invested_total']
+    fill_results(monthly_investments, contributions, frictions)
     
 
     return monthly_investments
 
     
 
-def dca_standard(df, monthly_contrib: float):
-    """Standard Dollar-Cost Averaging (DCA)"""
-
-    df = df.copy()
+@timed()
+def dca_standard(df, monthly_contrib: float, schedule=None, frictions=None):
+    """Standard Dollar-Cost Averaging (DCA)
+    schedule: when we buy (weekly, payroll dates...), see scheduler.buying_days. Default: first trading day of each month
+    frictions: fees, whole shares and interest on cash, see engine.FRICTIONS. Default: frictionless fractional buys at Close"""
 
-    monthly_investments = df.resample("MS").first() #because if we specify an exact date manually it could be a non-trading day
+    monthly_investments = indicators.scheduled(df, schedule) #because if we specify an exact date manually it could be a non-trading day
     #we buy at the first trading day of each month
 
 
-    shares_total = 0
-    invested_total = 0
+    contributions = np.full(len(monthly_investments), monthly_contrib, dtype=float)
 
-    for date, row in monthly_investments.iterrows():
-        investment_amount = monthly_contrib
-    
-
-        shares_bought = investment_amount/row["Close"]
-        shares_total += shares_bought
-        invested_total += investment_amount
-
-        monthly_investments.loc[date, 'shares_total'] = shares_total
-        monthly_investments.loc[date, 'invested_total'] = invested_total
-        monthly_investments.loc[date, 'portf_value'] = shares_total * row['Close']
-
-
-    #Profit/Loss
-    monthly_investments['profit_loss'] = monthly_investments['portf_value'] - monthly_investments['invested_total']
+    fill_results(monthly_investments, contributions, frictions)
     
 
     return monthly_investments
 
 
 
-def lump_sum(df, monthly_contrib: float):
+@timed()
+def lump_sum(df, monthly_contrib: float, schedule=None, frictions=None):
     "Lump Sum investment strategy: invest all money at the beginning date"
     "monthly_contrib is used as to calculate the total amount that should be invested as a lump sum to be comparable to the Normal DCA"
 
-    df = df.copy()
-    monthly_investments = df.resample("MS").first()
+    monthly_investments = indicators.scheduled(df, schedule)
 
     total_months = len(monthly_investments)
-    total_capital = total_months*monthly_contrib #so that the strategy uses the same amount of capital as Normal DCA
+    total_capital = total_months*monthly_contrib #so that the strategy uses the same amount of capital as Normal DCA (with the same schedule)
     
+    if frictions is not None:
+        contributions = np.zeros(total_months)
+        contributions[0] = total_capital
+        monthly_investments = fill_results(monthly_investments, contributions, frictions)
+        monthly_investments["invested_total"] = total_capital #same values, keeps the dtype of the frictionless version
+        return monthly_investments
+
     first_price = monthly_investments.loc[monthly_investments.index[0], "Close"]
     
     shares_total = total_capital/first_price
@@ -102,93 +83,70 @@ def lump_sum(df, monthly_contrib: float):
 
 
 
-def dca_sma_mom(df, monthly_contrib: float, sma_period: int = 90):
+@timed()
+def dca_sma_mom(df, monthly_contrib: float, sma_period: int = 90, schedule=None, frictions=None):
     """Simple Moving Average DCA
     Invest an amount (monthly_contrib) only when the price is above the X-day Simple Moving Average, investing in momentum"""
 
-    df = df.copy()
-    df["sma"] = df["Close"].rolling(sma_period).mean()
-    df["above_sma"] = df["Close"] > df["sma"] #we invest during uptrends, when momentum is high
-
-    monthly_investments = df.resample("MS").first()
-    monthly_investments["above_sma"] = df["above_sma"].resample("MS").first()
+    sma = indicators.sma(df, sma_period)
+    above_sma = df["Close"] > sma #we invest during uptrends, when momentum is high
 
-    shares_total = 0
-    invested_total = 0
+    monthly_investments = indicators.scheduled(df, schedule)
+    monthly_investments["sma"] = indicators.on_schedule(df, "sma", sma_period, schedule)
+    monthly_investments["above_sma"] = sample(above_sma, schedule)
 
-    for date, row in monthly_investments.iterrows():
-        if row["above_sma"] == True:
-            shares_bought = monthly_contrib/row["Close"]
-            shares_total += shares_bought
-            invested_total += monthly_contrib
+    contributions = np.where(monthly_investments["above_sma"].to_numpy(), monthly_contrib, 0) #nothing is invested in the months where the condition fails
+    deposits = np.full(len(contributions), monthly_contrib, dtype=float) #with a cash_rate the skipped months stay in cash
 
-        monthly_investments.loc[date, "shares_total"] = shares_total
-        monthly_investments.loc[date, "invested_total"] = invested_total
-        monthly_investments.loc[date, "portf_value"] = shares_total*row["Close"]
-    
-    monthly_investments["profit_loss"] = monthly_investments["portf_value"] - monthly_investments["invested_total"]
+    fill_results(monthly_investments, contributions, frictions, deposits)
 
 
     return monthly_investments
 
 
 
-def dca_sma_mean_rev(df, monthly_contrib: float, sma_period: int = 90):
+@timed()
+def dca_sma_mean_rev(df, monthly_contrib: float, sma_period: int = 90, schedule=None, frictions=None):
     """Simple Moving Average DCA
     Invest an amount (monthly_contrib) only when the price is above the X-day Simple Moving Average"""
 
-    df = df.copy()
-    df["sma"] = df["Close"].rolling(sma_period).mean()
-    df["above_sma"] = df["Close"] < df["sma"] #negative exposure to momentum (mean reversion)
-    monthly_investments = df.resample("MS").first()
-    monthly_investments["above_sma"] = df["above_sma"].resample("MS").first() ########do we actually need those two lines
+    sma = indicators.sma(df, sma_period)
+    above_sma = df["Close"] < sma #negative exposure to momentum (mean reversion)
 
-    shares_total = 0
-    invested_total = 0
+    monthly_investments = indicators.scheduled(df, schedule)
+    monthly_investments["sma"] = indicators.on_schedule(df, "sma", sma_period, schedule)
+    monthly_investments["above_sma"] = sample(above_sma, schedule)
 
-    for date, row in monthly_investments.iterrows():
-        if row["above_sma"] == True:
-            shares_bought = monthly_contrib/row["Close"]
-            shares_total += shares_bought
-            invested_total += monthly_contrib
+    contributions = np.where(monthly_investments["above_sma"].to_numpy(), monthly_contrib, 0) #nothing is invested in the months where the condition fails
+    deposits = np.full(len(contributions), monthly_contrib, dtype=float) #with a cash_rate the skipped months stay in cash
 
-        monthly_investments.loc[date, "shares_total"] = shares_total
-        monthly_investments.loc[date, "invested_total"] = invested_total
-        monthly_investments.loc[date, "portf_value"] = shares_total*row["Close"]
-    
-    monthly_investments["profit_loss"] = monthly_investments["portf_value"] - monthly_investments["invested_total"]
+    fill_results(monthly_investments, contributions, frictions, deposits)
 
 
     return monthly_investments
 
 
-def value_averaging(df, goal_monthly_growth: float=0.006, monthly_contrib = 1000):
+@timed()
+def value_averaging(df, goal_monthly_growth: float=0.006, monthly_contrib = 1000, goal_schedule=None, schedule=None, frictions=None):
     """Value Averaging: portfolio attempts to grow at a constant rate (~0.6%/month = 7.44%/year),
-    Invest when below the goal, do not invest when above"""
-
-    df = df.copy()
-    monthly_investments = df.resample("MS").first()
+    Invest when below the goal, do not invest when above.
+    goal_schedule can give the target portfolio value of every month instead (one value per month).
+    With another schedule the growth and the goal values are per purchase instead of per month"""
 
-    shares_total = 0
-    invested_total = 0
+    monthly_investments = indicators.scheduled(df, schedule)
+    close = monthly_investments["Close"].to_numpy()
 
-    for i, (date, row) in enumerate(monthly_investments.iterrows()):
-        goal_val = monthly_contrib*(1+i)*(1+goal_monthly_growth)**i
-        current_val = shares_total * row["Close"]
+    if frictions is None:
+        contributions = value_averaging_contributions(close, goal_monthly_growth, monthly_contrib, goal=goal_schedule)[0]
+        fill_results(monthly_investments, contributions)
+    else: #the fees and the rounding change what is held, so every month tops up from the actual shares and cash
+        goal = value_averaging_goals(len(close), goal_monthly_growth, monthly_contrib)[0] if goal_schedule is None else goal_schedule
+        fill_results(monthly_investments, np.zeros(len(close)), frictions, goal=goal)
 
-        investment_this_month = max(goal_val - current_val, 0) #we invest if we are behind target and do nothing if we are on track/ahead
 
-        if investment_this_month > 0:
-            shares_bought = investment_this_month / row["Close"]
-            shares_total += shares_bought
-            invested_total += investment_this_month
-        
-        monthly_investments.loc[date, "shares_total"] = shares_total
-        monthly_investments.loc[date, "invested_total"] = invested_total
-        monthly_investments.loc[date, "portf_value"] = shares_total*row["Close"]
+    return monthly_investments
 
-    monthly_investments["profit_loss"] = monthly_investments["portf_value"] - monthly_investments["invested_total"]
 
 
-    return monthly_investments
-        
\ No newline at end of file
+#strategies by name, for callers that get them from text (CLI, spec files)
+STRATEGIES = {f.__name__: f for f in (dca_standard, dca_DD, lump_sum, dca_sma_mom, dca_sma_mean_rev, value_averaging)}
@@ -0,0 +1,214 @@
+import os
+import json
+import math
+import inspect
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from .engine import value_averaging_goals
+from .kernels import rolling_mean_state, rolling_mean_push, rolling_mean_value
+from . import strategies
+
+
+class StreamingBacktest:
+    """Incremental version of a strategy for daily runs: new daily closes are fed to update(), which only
+    returns the new monthly rows instead of recomputing 25 years of history.
+    The running state (shares_total, invested_total, the last prices needed by the rolling 252-day high or the SMA,
+    the value averaging month) is plain JSON, see save()/load(), so it survives restarts.
+
+    Feeding the same closes in one or many update() calls gives exactly the rows of the full strategy function:
+    the SMA strategies keep the running sums of the pandas rolling mean (kernels.rolling_mean_push) in the state.
+    lump_sum is not supported: it invests the capital of the whole period on day one, so every new month changes its history"""
+
+    def __init__(self, strategy, **strategy_kwargs):
+        name = strategy if isinstance(strategy, str) else strategy.__name__
+        if name not in _STEPS:
+            raise ValueError(f"StreamingBacktest does not support the strategy '{name}'")
+
+        bound = inspect.signature(strategies.STRATEGIES[name]).bind(None, **strategy_kwargs) #same errors as calling the strategy
+        bound.apply_defaults()
+        kwargs = {k: v for k, v in bound.arguments.items() if k != "df"}
+        if kwargs.get("schedule") not in (None, "monthly") or kwargs.get("frictions") is not None:
+            raise ValueError("StreamingBacktest only supports the frictionless monthly schedule")
+        if kwargs.get("goal_schedule") is not None:
+            kwargs["goal_schedule"] = np.asarray(kwargs["goal_schedule"], dtype=float).tolist()
+
+        self.strategy = name
+        self.kwargs = kwargs
+        self.state = {
+            "last_date": None,
+            "n_months": 0,
+            "shares_total": 0.0,
+            "invested_total": 0.0,
+            "window": [], #last closes, as many as the longest rolling window of the strategy
+            "rolling_mean": rolling_mean_state() if "sma_period" in kwargs else None,
+            "open_row": None #row of the current month, its indicator columns can still be filled by a later day
+        }
+
+    def _window_size(self):
+        if self.strategy == "dca_DD":
+            return 252
+        if self.strategy in ("dca_sma_mom", "dca_sma_mean_rev"):
+            return int(self.kwargs["sma_period"])
+        return 0
+
+    def update(self, df: pd.DataFrame):
+        """Processes new daily prices (a frame with a Close column, e.g. from load_price_data) and returns the monthly rows
+        that are new or changed, with the same columns as the strategy function.
+        Days up to the last processed date are skipped, so overlapping downloads can be fed as they are.
+        A row only changes during the first window days of the history, when an indicator column gets its first value
+        later in the month, like resample("MS").first() does. Use merge_rows to add the result to the previous rows"""
+
+        state = self.state
+        size = self._window_size()
+        window = state["window"]
+        step = _STEPS[self.strategy]
+
+        closes = df["Close"].dropna().sort_index()
+        if state["last_date"] is not None:
+            closes = closes[closes.index > pd.Timestamp(state["last_date"])]
+
+        dates = closes.index.strftime("%Y-%m-%d").tolist()
+        months = closes.index.strftime("%Y-%m-01").tolist() #monthly rows are labelled with the 1st of the month, like resample("MS")
+
+        emitted = {}
+        for date, month, close in zip(dates, months, closes.to_numpy(dtype=float).tolist()):
+            if size:
+                if state["rolling_mean"] is not None:
+                    rolling_mean_push(state["rolling_mean"], close, window[0] if len(window) == size else None, size)
+                window.append(close)
+                del window[:-size]
+
+            row = state["open_row"]
+
+            if row is None or row["Date"] != month: #first trading day of a new month: we buy
+                indicator_cols, decision = step.indicators(self.kwargs, state, close)
+                contribution = step.contribution(self.kwargs, state, close, decision)
+
+                state["shares_total"] += contribution/close
+                state["invested_total"] += contribution
+                state["n_months"] += 1
+
+                portf_value = state["shares_total"]*close
+                row = {"Date": month, "Close": close, **indicator_cols, **decision,
+                       "shares_total": state["shares_total"], "invested_total": state["invested_total"],
+                       "portf_value": portf_value, "profit_loss": portf_value - state["invested_total"]}
+                state["open_row"] = row
+                emitted[row["Date"]] = row
+
+            elif any(_is_nan(row[col]) for col in step.indicator_names):
+                indicator_cols, _ = step.indicators(self.kwargs, state, close)
+                filled = False
+                for col, value in indicator_cols.items():
+                    if _is_nan(row[col]) and not _is_nan(value):
+                        row[col] = value
+                        filled = True
+                if filled:
+                    emitted[row["Date"]] = dict(row)
+
+            state["last_date"] = date
+
+        rows = pd.DataFrame(list(emitted.values()),
+                            columns=["Date", "Close", *step.indicator_names, *step.decision_names,
+                                     "shares_total", "invested_total", "portf_value", "profit_loss"])
+        rows["Date"] = pd.to_datetime(rows["Date"])
+        return rows.set_index("Date")
+
+    def to_dict(self):
+        return {"strategy": self.strategy, "kwargs": self.kwargs, "state": self.state}
+
+    @classmethod
+    def from_dict(cls, data):
+        stream = cls(data["strategy"], **data["kwargs"])
+        stream.state = data["state"]
+        return stream
+
+    def save(self, path):
+        """Writes the state as JSON, atomically so a crash never leaves a half-written state"""
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.to_dict())) #floats are written with repr, they load back bit for bit
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+
+
+def merge_rows(results: pd.DataFrame, rows: pd.DataFrame):
+    """Adds the rows returned by update() to the previous ones, a changed month replaces its old row"""
+
+    if not len(rows):
+        return results
+    if not len(results):
+        return rows
+
+    merged = pd.concat([results, rows])
+    return merged[~merged.index.duplicated(keep="last")]
+
+
+def _is_nan(value):
+    return isinstance(value, float) and math.isnan(value)
+
+
+
+class _Step:
+    """What a strategy computes on the first trading day of a month: its indicator columns (as in the strategy output),
+    its decision columns and the contribution"""
+
+    def __init__(self, indicator_names, decision_names, indicators, contribution):
+        self.indicator_names = indicator_names
+        self.decision_names = decision_names
+        self.indicators = indicators
+        self.contribution = contribution
+
+
+def _no_indicators(kwargs, state, close):
+    return {}, {}
+
+
+def _DD_indicators(kwargs, state, close):
+    window = state["window"]
+    high = max(window) if len(window) == 252 else math.nan
+    drawdown = close/high
+    return {"12m_high": high, "drawdown": drawdown}, {"DD_cond": drawdown <= (1-kwargs["DD_threshold"])} #NaN compares as False
+
+
+def _sma_indicators(above):
+    def indicators(kwargs, state, close):
+        sma = rolling_mean_value(state["rolling_mean"], int(kwargs["sma_period"]))
+        return {"sma": sma}, {"above_sma": close > sma if above else close < sma}
+    return indicators
+
+
+def _standard_contribution(kwargs, state, close, decision):
+    return float(kwargs["monthly_contrib"])
+
+
+def _DD_contribution(kwargs, state, close, decision):
+    return float(kwargs["monthly_contrib"]*(2 if decision["DD_cond"] else 1))
+
+
+def _sma_contribution(kwargs, state, close, decision):
+    return float(kwargs["monthly_contrib"] if decision["above_sma"] else 0)
+
+
+def _va_contribution(kwargs, state, close, decision):
+    i = state["n_months"]
+    if kwargs["goal_schedule"] is not None:
+        goal = kwargs["goal_schedule"][i]
+    else:
+        goal = float(value_averaging_goals(i+1, kwargs["goal_monthly_growth"], kwargs["monthly_contrib"], start=i)[0, 0])
+    return max(goal - state["shares_total"]*close, 0.0)
+
+
+_STEPS = {
+    "dca_standard": _Step([], [], _no_indicators, _standard_contribution),
+    "dca_DD": _Step(["12m_high", "drawdown"], ["DD_cond"], _DD_indicators, _DD_contribution),
+    "dca_sma_mom": _Step(["sma"], ["above_sma"], _sma_indicators(above=True), _sma_contribution),
+    "dca_sma_mean_rev": _Step(["sma"], ["above_sma"], _sma_indicators(above=False), _sma_contribution),
+    "value_averaging": _Step([], [], _no_indicators, _va_contribution)
+}
@@ -0,0 +1,117 @@
+import inspect
+import numpy as np
+import pandas as pd
+from .engine import accumulate, value_averaging_contributions
+from .metrics import irr_batch
+from .scheduler import buying_days
+from .strategies import lump_sum, value_averaging
+from .backtest import _CONTRIBUTIONS, _with_defaults
+
+
+def walk_forward(df: pd.DataFrame, strategy, *strategy_args, horizons=None, irr: bool = True, **strategy_kwargs):
+    """Results of a strategy for every start month and every holding horizon (in months) at once:
+    "what if the client had started in month s and sold h months later".
+    Returns a dict metric name -> (start dates x horizons) DataFrame with the compute_KeyMetrics numbers,
+    NaN where the horizon goes past the data. horizons=None is every horizon, e.g. range(12, 301, 12) for whole years.
+    irr=False skips the IRR, the slowest metric.
+
+    Every start is one row of a (starts x months held) matrix of prices and contributions, and the engine's
+    cumulative sums along the rows give the running shares/invested of every start in one pass
+    (prefix sums of contribution/price restarted at each start). Value averaging goes through its batched kernel,
+    one row per start. The rolling indicators (DD, SMA) come from the whole history:
+    a client starting in 2010 still sees the 2009 high"""
+
+    config = inspect.signature(strategy).bind(df, *strategy_args, **strategy_kwargs).arguments
+    config.pop("df")
+    schedule = config.pop("schedule", None)
+    if config.get("goal_schedule") is not None or config.pop("frictions", None) is not None:
+        raise ValueError("walk_forward does not support goal_schedule or frictions")
+    if strategy not in _CONTRIBUTIONS:
+        raise ValueError(f"walk_forward does not support the strategy '{strategy.__name__}'")
+
+    config = _with_defaults(strategy, [config])[0]
+    columns = {name: np.array([value], dtype=float) for name, value in config.items()}
+
+    labels, first_day = buying_days(df.index, schedule)
+    close = df["Close"].to_numpy(dtype=float)
+    monthly_close = close[first_day]
+    n_months = len(monthly_close)
+
+    horizons = np.arange(1, n_months+1) if horizons is None else np.asarray(horizons, dtype=int)
+    n_held = int(horizons.max())
+
+    #row s, column j: month s+j (clipped at the last month, the cells past the data are masked at the end)
+    month = np.minimum(np.arange(n_months)[:, None] + np.arange(n_held), n_months-1)
+    inside = np.arange(n_months)[:, None] + np.arange(n_held) < n_months
+    close_held = monthly_close[month]
+
+    if strategy is value_averaging:
+        contributions = value_averaging_contributions(close_held, columns["goal_monthly_growth"], columns["monthly_contrib"])
+    elif strategy is lump_sum:
+        contributions = np.zeros(close_held.shape)
+        contributions[:, 0] = columns["monthly_contrib"][0] #scaled by the horizon below, lump_sum invests horizon*monthly_contrib
+    else:
+        market = {"close": close, "monthly_close": monthly_close, "first_day": first_day}
+        contributions = _CONTRIBUTIONS[strategy](market, columns)[0][month] #depends on the calendar month only
+
+    contributions = np.where(inside, contributions, 0)
+    results = accumulate(close_held, contributions)
+    invested, value = results["invested_total"], results["portf_value"]
+
+    day = labels.to_numpy().astype("datetime64[D]").astype(np.int64) #day numbers, like the .days of compute_KeyMetrics_batch
+    years = (day[month] - day[:, None])/365
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        peak = np.maximum.accumulate(value, axis=1)
+        max_drawdown = np.fmin.accumulate(value/peak - 1, axis=1)*100 #worst drawdown up to every horizon
+
+        cols = horizons - 1
+        final_invested, final_value, held_years = invested[:, cols], value[:, cols], years[:, cols]
+        if strategy is lump_sum:
+            final_invested, final_value = final_invested*horizons, final_value*horizons
+
+        ROI = (final_value/final_invested - 1)*100
+        CAGR = ((final_value/final_invested)**(1/held_years) - 1)*100
+        max_drawdown = max_drawdown[:, cols]
+        calmar = CAGR/np.abs(max_drawdown)
+
+    metrics = {
+        "Total Invested": final_invested,
+        "Final Value": final_value,
+        "ROI": ROI,
+        "IRR": _irr(contributions, value, years, horizons) if irr else None,
+        "CAGR": CAGR,
+        "Max Drawdown": max_drawdown,
+        "Calmar Ratio": calmar,
+        "Years": held_years
+    }
+
+    valid = inside[:, cols]
+    index = pd.DatetimeIndex(labels, name="Start")
+    return {name: pd.DataFrame(np.where(valid, values, np.nan), index=index, columns=pd.Index(horizons, name="Horizon"))
+            for name, values in metrics.items() if values is not None}
+
+
+def _irr(contributions, value, years, horizons):
+    """XIRR of every (start, horizon), one irr_batch call per horizon over all the starts that fit in the data"""
+
+    n_months = len(years)
+    out = np.full((n_months, len(horizons)), np.nan)
+    for k, h in enumerate(horizons):
+        starts = np.arange(n_months - h + 1)
+        if len(starts) == 0 or h < 2:
+            continue
+
+        paid, held = contributions[starts, :h], years[starts, :h]
+        cashflows = -paid
+        cashflows[:, -1] += value[starts, h-1] #we liquidate the investment to calc irr
+
+        #starting point: the growth of the money over its average holding time, saves Newton steps on most rows
+        with np.errstate(divide="ignore", invalid="ignore"):
+            holding = (paid*(held[:, -1:] - held)).sum(axis=1)/paid.sum(axis=1)
+            guess = (value[starts, h-1]/paid.sum(axis=1))**(1/holding) - 1
+        guess = np.where(np.isfinite(guess) & (guess > -0.99), guess, 0.1)
+
+        out[starts, k] = irr_batch(cashflows, held, guess=guess)[0]*100
+
+    return out
@@ -1,15 +1,21 @@
 import panel as pn
 import pandas as pd
 import datetime as dt
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 pn.extension()
-import hvplot.pandas
-import holoviews as hv
-from bokeh.models import HoverTool
-from bokeh.models import NumeralTickFormatter
+#hvplot/holoviews are imported the first time the heatmap is plotted, see build_heatmap
 
 from dca_simulator.data_loader import load_price_data
 from dca_simulator.strategies import (dca_standard, dca_DD, lump_sum, dca_sma_mom, dca_sma_mean_rev, value_averaging)
 from dca_simulator.metrics import compute_KeyMetrics
+from dca_simulator.walkforward import walk_forward
+from dca_simulator.results import BacktestResult
+from dca_simulator.portfolio import portfolio_dca, price_matrix, parse_weights
+from dca_simulator.cache import LRUCache
+from dca_simulator.charts import DownsampledChart
+from dca_simulator import profiling
 
 
 
@@ -42,6 +48,12 @@ strategy_selector = pn.widgets.CheckBoxGroup(name="Strategies",
                                                        inline=False)
 
 
+##target-weight portfolio, run next to the strategies when weights are given
+portfolio_weights = pn.widgets.TextInput(name="Portfolio weights", placeholder="SPY:60, AGG:40", value="", width=200)
+rebalance_select = pn.widgets.Select(name="Rebalancing", options={"Never": "never", "Quarterly": "quarterly", "Yearly": "YS"}, value="never")
+drift_slider = pn.widgets.FloatSlider(name="Rebalance on weight drift (0 = off)", start=0, end=0.2, step=0.01, value=0)
+
+
 ##plot variable options
 plot_var_options = {
     "Portfolio Value ($)": "portf_value",
@@ -55,6 +67,9 @@ plot_var = pn.widgets.Select(name="Variable to plot",
                              options=list(plot_var_options.keys()),
                              value="Portfolio Value ($)")
 
+##metric of the start date heatmap
+heatmap_metric = pn.widgets.Select(name="Start date heatmap", options=["ROI", "IRR", "CAGR", "Max Drawdown"], value="IRR")
+
 ##run button
 run_button = pn.widgets.Button(name="Run Simulation", button_type="primary")
 
@@ -71,14 +86,29 @@ var_labels = {
 
 ###Output###
 ##preview
-preview_pane = pn.pane.HoloViews(None, sizing_mode="stretch_width", height=350)
+preview_chart = DownsampledChart(method="minmax") #daily closes, min-max keeps every spike
+preview_pane = pn.pane.Bokeh(preview_chart.figure, sizing_mode="stretch_width", height=350)
 
 ##plot
-plot_pane = pn.pane.HoloViews(None, sizing_mode="stretch_width", height = 350)
+strategy_chart = DownsampledChart()
+plot_pane = pn.pane.Bokeh(strategy_chart.figure, sizing_mode="stretch_width", height = 350)
 
 ##metrics comparison table
 metrics_pane = pn.pane.DataFrame(None, sizing_mode="stretch_width")
 
+##start date x horizon heatmap of the first selected strategy
+heatmap_pane = pn.pane.HoloViews(None, sizing_mode="stretch_width", height=400)
+
+##stage timings of the last run, only shown when profiling is on (DCA_PROFILE=1, see dca_simulator/profiling.py)
+debug_pane = pn.pane.DataFrame(None, sizing_mode="stretch_width")
+debug_card = pn.Card(debug_pane, title="Debug: stage timings", collapsed=True, visible=profiling.is_enabled(), sizing_mode="stretch_width")
+
+##progress of the current run
+progress = pn.indicators.Progress(name="Progress", value=0, max=1, visible=False, sizing_mode="stretch_width")
+status = pn.pane.Markdown("")
+cache_info = pn.pane.Markdown("")
+payload_info = pn.pane.Markdown("")
+
 
 #Layout
 template = pn.template.FastListTemplate(title = "Retail Investment Strategy Backtester",
@@ -91,120 +121,287 @@ template = pn.template.FastListTemplate(title = "Retail Investment Strategy Back
              DD_treshold_slider,
              pn.pane.Markdown("### Strategies"), 
              strategy_selector, 
+             pn.pane.Markdown("### Portfolio"),
+             portfolio_weights,
+             rebalance_select,
+             drift_slider,
              pn.pane.Markdown("### Plot Settings"), 
              plot_var, 
-             run_button],
+             heatmap_metric,
+             run_button,
+             progress,
+             status,
+             cache_info,
+             payload_info],
 
     main=[pn.pane.Markdown("## Data Preview"),
           preview_pane,
           pn.pane.Markdown("## Strategy Plot"),
           plot_pane,
           pn.pane.Markdown("## Key Metrics"),
-          metrics_pane])
+          metrics_pane,
+          pn.pane.Markdown("## Start Date Analysis"),
+          heatmap_pane,
+          debug_card])
 
 template.servable()
 
 
 
 ###Simulation func###
-def run_simulation(simulation):
-    """Run the simulation with the specified parameters from the "Run Simulation" button"""
+#loading and strategies run on worker threads so the server keeps answering the other sessions.
+#panel serve runs this file again for every session, pn.state.cache is what the sessions share:
+#the pool and the results cache live there
+executor = pn.state.cache.setdefault("dca_executor", ThreadPoolExecutor(max_workers=8))
 
-    selected_ticker = ticker.value
-    selected_strategies = strategy_selector.value
-    selected_var = plot_var_options[plot_var.value]
-    start = start_date.value
-    end = end_date.value
-    monthly_c = monthly_contrib.value
-    growth = growth_slider.value
-    sma_p = sma_period_slider.value
-    dd_tresh = DD_treshold_slider.value
+#prices and strategy results keyed on the inputs, so changing plot_var or adding a strategy only computes what is new.
+#the TTL makes today's prices get refreshed
+results_cache = pn.state.cache.setdefault("dca_results", LRUCache(maxsize=256, ttl=3600))
+
+current_run = None #task of the run in progress in this session
 
-    ##Data loading
-    try:    
-        df = load_price_data(selected_ticker, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
 
-        if df is None or df.empty:
+def strategy_jobs(selected_strategies, monthly_c, dd_tresh, sma_p, growth):
+    """(result name, strategy, args) of every selected strategy"""
+
+    jobs = {"DCA": ("DCA", dca_standard, (monthly_c,)),
+            "Double Down DCA": ("Double Down DCA", dca_DD, (monthly_c, dd_tresh)),
+            "Lump Sum": ("Lump Sum", lump_sum, (monthly_c,)),
+            "Simple Moving Average DCA - Momentum": ("SMA Momentum", dca_sma_mom, (monthly_c, sma_p)),
+            "Simple Moving Average DCA - Mean Reversion": ("SMA Mean Reversion", dca_sma_mean_rev, (monthly_c, sma_p)),
+            "Value Averaging": ("Value Averaging", value_averaging, (growth, monthly_c))}
+
+    return [jobs[strat] for strat in selected_strategies]
+
+
+@profiling.timed("interface.load_prices")
+def cached_prices(selected_ticker, start, end):
+    def load():
+        df = load_price_data(selected_ticker, start, end)
+        if df is None or df.empty: #raising keeps failed downloads out of the cache
             raise ValueError(f"No data found for ticker '{selected_ticker}'.")
-        
-        preview_pane.object = df.hvplot.line(y="Close", title=f"{selected_ticker} Price History", responsive=True)
-    
+        return df
+
+    return results_cache.get_or_compute(("prices", selected_ticker, start, end), load)
+
+
+def cached_strategy(prices_key, name, strategy, df, args):
+    key = ("strategy", prices_key, strategy.__name__, args)
+    return results_cache.get_or_compute(key, lambda: run_strategy(name, strategy, df, args))
+
+
+@profiling.timed("interface.walk_forward")
+def cached_walk_forward(prices_key, strategy, df, args):
+    """Every start month x every whole number of years held, see walk_forward"""
+
+    key = ("walk_forward", prices_key, strategy.__name__, args)
+    return results_cache.get_or_compute(key, lambda: walk_forward(df, strategy, *args, horizons=range(12, 12*len(df.index.year.unique())+1, 12)))
+
+
+@profiling.timed("interface.portfolio")
+def cached_portfolio(start, end, weights, monthly_c, rebalance, drift):
+    """Runs on a worker thread: the prices of every asset (each one cached like a single ticker) and the portfolio"""
+
+    key = ("portfolio", start, end, tuple(weights.items()), monthly_c, rebalance, drift)
+
+    def run():
+        prices = price_matrix({asset: cached_prices(asset, start, end) for asset in weights})
+        df_result = portfolio_dca(prices, weights, monthly_c, rebalance=None if rebalance == "never" else rebalance,
+                                  drift_threshold=drift or None)
+        metrics = compute_KeyMetrics(df_result)
+        metrics["Strategy"] = "Portfolio"
+        return df_result, metrics
+
+    return results_cache.get_or_compute(key, run)
 
+
+def show_cache_info():
+    stats = results_cache.stats()
+    cache_info.object = f"Cache: {stats['size']} results, hit rate {stats['hit_rate']:.0%} ({stats['hits']} hits / {stats['misses']} misses)"
+
+
+@profiling.timed("interface.run_strategy")
+def run_strategy(name, strategy, df, args):
+    """Runs on a worker thread: the strategy and its metrics (None if they cannot be computed).
+    The result is cached as a float32 BacktestResult, the metrics are computed before on the full precision frame"""
+
+    df_result = strategy(df, *args)
+
+    try:
+        metrics = compute_KeyMetrics(df_result)
+        metrics["Strategy"] = name
     except Exception as e:
-        preview_pane.object = pn.pane.Markdown(f"**Error loading the data:** {str(e)}")
-        plot_pane.object = None
-        metrics_pane.object = None
-        return
+        print(f'Error computing metrics for {name}: {e}')
+        metrics = None
 
+    return BacktestResult.from_frame(df_result, float32=True), metrics
 
-    ##Strategies
-    results = {}
 
-    for strat in selected_strategies:
-        if strat == "DCA":
-            results["DCA"] = dca_standard(df, monthly_c)
-        
-        elif strat == "Double Down DCA":
-            results["Double Down DCA"] = dca_DD(df, monthly_c, dd_tresh)
+@profiling.timed("interface.build_plot")
+def build_plot(results, selected_var):
+    """Shows selected_var of every finished strategy in the strategy chart, downsampled to the plot width.
+    The curves already shown are updated in place (see DownsampledChart), so re-renders only send what changed"""
 
-        elif strat == "Lump Sum":
-            results["Lump Sum"] = lump_sum(df, monthly_c)
+    from bokeh.models import NumeralTickFormatter
 
-        elif strat == "Simple Moving Average DCA - Momentum":
-            results["SMA Momentum"] = dca_sma_mom(df, monthly_c, sma_p)
-        
-        elif strat == "Simple Moving Average DCA - Mean Reversion":
-            results["SMA Mean Reversion"] = dca_sma_mean_rev(df, monthly_c, sma_p)
-        
-        elif strat == "Value Averaging":
-            results["Value Averaging"] = value_averaging(df, growth, monthly_c)
+    #a portfolio has no shares_total, only shares of every asset
+    strategy_chart.render({name: (result.index, result[selected_var]) for name, result in results.items() if selected_var in result})
 
+    fig = strategy_chart.figure
+    fig.title.text = f"{var_labels[selected_var]} over Time"
+    fig.yaxis.axis_label = var_labels[selected_var]
+    fmt = "$0,0" if selected_var in ["portf_value", "invested_total", "profit_loss"] else "0,0" #$ sign and commas for money variables
+    fig.yaxis.formatter = NumeralTickFormatter(format=fmt)
+    show_payload_info()
 
 
+def show_payload_info():
+    payload = preview_chart.payload + strategy_chart.payload
+    full = preview_chart.full_payload + strategy_chart.full_payload
+    payload_info.object = f"Plot data sent: {payload/1024:,.1f} kB (full series: {full/1024:,.1f} kB)"
 
-    ##Plotting
-    plots = []
 
+@profiling.timed("interface.build_heatmap")
+def build_heatmap(matrices, metric, name):
+    """Heatmap of one walk_forward metric, start month on x and years held on y"""
 
+    import hvplot.pandas
 
-    def format_axis(plot, element):
-        """Format y-axis to show $ sign and commas for money variables """
-        fmt="$0,0" if selected_var in ["portf_value", "invested_total", "profit_loss"] else "0,0"
-        plot.state.yaxis.formatter = NumeralTickFormatter(format=fmt)
+    cells = matrices[metric].rename(columns=lambda h: h//12).stack().rename(metric).reset_index()
+    return cells.hvplot.heatmap(x="Start", y="Horizon", C=metric, cmap="RdYlGn",
+                                xlabel="Start month", ylabel="Years held", clabel=f"{metric} (%)",
+                                title=f"{name}: {metric} by start date and holding period", responsive=True, height=400)
 
 
+def show_profile(before, started):
+    """Stage breakdown since the before snapshot. The counters are process wide: runs of other sessions
+    at the same time are included"""
 
-    for name, df_result in results.items():
-        curve = df_result.hvplot(y=selected_var, 
-                                 ylabel=var_labels[selected_var], 
-                                 label=name, #legend label
-                                 title=f"{var_labels[selected_var]} over Time",
-                                 height=350, 
-                                 responsive=True).opts(hooks=[format_axis]) #format y-axis to financial notation
-        plots.append(curve)
+    if profiling.is_enabled():
+        debug_pane.object = profiling.table(profiling.diff(before, profiling.snapshot()))
+        debug_card.title = f"Debug: stage timings of the last run ({time.perf_counter() - started:.2f} s)"
 
-    interact_plot = plots[0]
-    for curve in plots[1:]:
-        interact_plot *= curve #add the curves on top of each other
 
-    plot_pane.object = interact_plot
+def show_progress(done, pending):
+    progress.value = done
+    status.object = "Running: " + ", ".join(pending) if pending else ""
 
 
+@profiling.timed("interface.run_simulation")
+async def run_simulation(simulation):
+    """Run the simulation with the specified parameters from the "Run Simulation" button.
+    A new click cancels the run still in progress, every strategy is shown as soon as it finishes"""
 
-    ##Key Metrics table
-    metrics_list = []
+    try:
+        weights = parse_weights(portfolio_weights.value)
+    except ValueError as e:
+        status.object = f"Portfolio weights: {e}"
+        return
+
+    global current_run
+    if current_run is not None and not current_run.done() and current_run is not asyncio.current_task():
+        current_run.cancel()
+    current_run = asyncio.current_task()
+    profile_before, started = profiling.snapshot(), time.perf_counter()
+
+    selected_ticker = ticker.value
+    selected_strategies = strategy_selector.value
+    selected_var = plot_var_options[plot_var.value]
+    start = start_date.value
+    end = end_date.value
+    monthly_c = monthly_contrib.value
+    growth = growth_slider.value
+    sma_p = sma_period_slider.value
+    dd_tresh = DD_treshold_slider.value
+
+    jobs = strategy_jobs(selected_strategies, monthly_c, dd_tresh, sma_p, growth)
+    loop = asyncio.get_running_loop()
+
+    progress.max, progress.visible = 1 + len(jobs) + bool(weights) + bool(jobs), True #data loading, strategies, start date analysis (only with strategies)
+    show_progress(0, ["data loading"])
+
+    try:
+        ##Data loading
+        try:    
+            prices_key = (selected_ticker.upper().strip(), start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+            df = await loop.run_in_executor(executor, cached_prices, *prices_key)
+            
+            with profiling.stage("interface.preview"):
+                preview_chart.render({"Close": (df.index, df["Close"])}) #same name whatever the ticker, so the source is reused
+                preview_chart.figure.title.text = f"{selected_ticker} Price History"
+            show_payload_info()
+        
 
-    for name, df_result in results.items():
-        try:
-            metrics = compute_KeyMetrics(df_result)
-            metrics["Strategy"] = name
-            metrics_list.append(metrics)
         except Exception as e:
-            print(f'Error computing metrics for {name}: {e}')
+            preview_chart.render({})
+            preview_chart.figure.title.text = f"Error loading the data: {str(e)}"
+            strategy_chart.render({})
+            metrics_pane.object = None
+            heatmap_pane.object = None
+            return
+
+
+        ##Strategies, one task per strategy
+        metrics_pane.object = None
+        heatmap_pane.object = None
 
-    
-    metrics_df = pd.DataFrame(metrics_list).set_index("Strategy")
-    metrics_pane.object = metrics_df
+        tasks = {asyncio.ensure_future(loop.run_in_executor(executor, cached_strategy, prices_key, name, strategy, df, args)): name
+                 for name, strategy, args in jobs}
+        if weights:
+            tasks[asyncio.ensure_future(loop.run_in_executor(executor, cached_portfolio, *prices_key[1:], weights, monthly_c,
+                                                             rebalance_select.value, drift_slider.value))] = "Portfolio"
+        pending = set(tasks)
+        show_progress(1, list(tasks.values()))
+        if not tasks:
+            build_plot({}, selected_var)
+
+        results = {}
+        metrics_list = []
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    name = tasks[task]
+                    try:
+                        df_result, metrics = task.result()
+                    except Exception as e:
+                        print(f'Error running {name}: {e}')
+                        continue
+
+                    results[name] = df_result
+                    if metrics is not None:
+                        metrics_list.append(metrics)
+
+                ##Plotting and Key Metrics table, updated with what has finished so far
+                if results:
+                    build_plot(results, selected_var)
+                if metrics_list:
+                    metrics_pane.object = pd.DataFrame(metrics_list).set_index("Strategy")
+                show_progress(1 + len(tasks) - len(pending), [tasks[task] for task in pending])
+
+        finally:
+            for task in pending: #cancelled run: drop what has not finished yet
+                task.cancel()
+
+
+        ##Start date analysis of the first selected strategy
+        if jobs:
+            name, strategy, args = jobs[0]
+            show_progress(progress.max - 1, ["start date analysis"])
+            try:
+                matrices = await loop.run_in_executor(executor, cached_walk_forward, prices_key, strategy, df, args)
+                heatmap_pane.object = build_heatmap(matrices, heatmap_metric.value, name)
+            except Exception as e:
+                print(f'Error in the start date analysis of {name}: {e}')
+
+    finally:
+        if current_run is asyncio.current_task():
+            progress.visible = False
+            status.object = ""
+        show_cache_info()
+        show_profile(profile_before, started)
 
 
 
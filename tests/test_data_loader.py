@@ -0,0 +1,133 @@
+import threading
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+from dca_simulator import data_loader
+from dca_simulator.data_loader import load_price_data
+
+PRICES = pd.DataFrame({"Close": np.linspace(10, 60, 2610)}, index=pd.bdate_range("2013-01-01", periods=2610, name="Date"))
+
+
+class Fetcher:
+    """Offline fetcher serving PRICES like yfinance (end excluded), records its calls"""
+
+    def __init__(self, delay=0.0, prices=PRICES):
+        self.calls = []
+        self.delay = delay
+        self.prices = prices
+        self.lock = threading.Lock()
+
+    def __call__(self, ticker, start_date, end_date):
+        with self.lock:
+            self.calls.append((start_date, end_date))
+        if self.delay:
+            threading.Event().wait(self.delay) #lets other threads run in the middle of a load
+        return self.prices.loc[(self.prices.index >= start_date) & (self.prices.index < end_date)]
+
+
+def expected(start, end):
+    return PRICES.loc[(PRICES.index >= start) & (PRICES.index < end)]
+
+
+def test_cache_serves_the_fetched_prices(tmp_path):
+    fetcher = Fetcher()
+    first = load_price_data("X", "2015-01-01", "2017-01-01", fetcher=fetcher, cache_dir=tmp_path)
+    again = load_price_data("X", "2015-06-01", "2016-06-01", fetcher=fetcher, cache_dir=tmp_path)
+    wider = load_price_data("X", "2014-01-01", "2018-01-01", fetcher=fetcher, cache_dir=tmp_path)
+
+    pd.testing.assert_frame_equal(first, expected("2015-01-01", "2017-01-01"), check_freq=False, check_index_type=False)
+    pd.testing.assert_frame_equal(again, expected("2015-06-01", "2016-06-01"), check_freq=False, check_index_type=False)
+    pd.testing.assert_frame_equal(wider, expected("2014-01-01", "2018-01-01"), check_freq=False, check_index_type=False)
+    #the extensions overlap the first/last cached bar (2015-01-01 and 2016-12-30) to check it was not adjusted since
+    assert fetcher.calls == [("2015-01-01", "2017-01-01"), ("2014-01-01", "2015-01-02"), ("2016-12-30", "2018-01-01")]
+
+
+def test_concurrent_loads_keep_the_cache_consistent(tmp_path):
+    ranges = [("2013-01-01", "2018-01-01"), ("2016-01-01", "2023-01-01"), ("2014-06-01", "2020-01-01"), ("2019-01-01", "2023-01-01")]
+
+    for _ in range(5):
+        cache_dir = tmp_path / str(_)
+        fetcher = Fetcher(delay=0.005)
+        results, errors = {}, []
+
+        def load(i):
+            start, end = ranges[i % len(ranges)]
+            try:
+                results[i] = (start, end, load_price_data("X", start, end, fetcher=fetcher, cache_dir=cache_dir))
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=load, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        for start, end, df in results.values():
+            np.testing.assert_array_equal(df["Close"].to_numpy(), expected(start, end)["Close"].to_numpy())
+
+        dates, close, _ = data_loader._read_cache(cache_dir, "X")
+        assert len(dates) == len(close)
+        assert list(cache_dir.glob("*.tmp")) == []
+
+
+def test_unreadable_cache_is_rebuilt(tmp_path):
+    fetcher = Fetcher()
+    load_price_data("X", "2015-01-01", "2016-01-01", fetcher=fetcher, cache_dir=tmp_path)
+    data_loader._array_path(tmp_path, "X").write_bytes(b"not a numpy file")
+
+    df = load_price_data("X", "2015-01-01", "2016-01-01", fetcher=fetcher, cache_dir=tmp_path)
+
+    np.testing.assert_array_equal(df["Close"].to_numpy(), expected("2015-01-01", "2016-01-01")["Close"].to_numpy())
+    assert len(fetcher.calls) == 2
+
+
+def test_reversed_range_is_empty_and_not_cached(tmp_path):
+    fetcher = Fetcher()
+    assert load_price_data("X", "2020-06-01", "2019-06-01", fetcher=fetcher, cache_dir=tmp_path).empty
+    assert fetcher.calls == []
+
+    df = load_price_data("X", "2019-01-01", "2021-01-01", fetcher=fetcher, cache_dir=tmp_path)
+    assert len(df) == len(expected("2019-01-01", "2021-01-01"))
+
+
+def test_future_dates_are_not_marked_covered(tmp_path):
+    fetcher = Fetcher()
+    today = dt.date.today()
+    end = str(today + dt.timedelta(days=30))
+
+    load_price_data("X", "2020-01-01", end, fetcher=fetcher, cache_dir=tmp_path)
+    load_price_data("X", "2020-01-01", end, fetcher=fetcher, cache_dir=tmp_path)
+
+    _, _, covered = data_loader._read_cache(tmp_path, "X")
+    assert covered[1] == pd.Timestamp(today)
+    assert fetcher.calls[-1][0] <= str(today) and fetcher.calls[-1][1] == end #bars added since the first call are fetched
+
+
+def test_without_cache():
+    df = load_price_data("X", "2015-01-01", "2016-01-01", fetcher=Fetcher(), cache_dir=None)
+    assert len(df) == len(expected("2015-01-01", "2016-01-01"))
+
+
+def test_rescaled_history_rebuilds_the_cache(tmp_path):
+    fetcher = Fetcher()
+    load_price_data("X", "2015-01-01", "2017-01-01", fetcher=fetcher, cache_dir=tmp_path)
+
+    fetcher.prices = PRICES/2 #a 2:1 split since: the provider adjusts the whole history
+    df = load_price_data("X", "2016-01-01", "2018-01-01", fetcher=fetcher, cache_dir=tmp_path)
+    np.testing.assert_array_equal(df["Close"].to_numpy(), expected("2016-01-01", "2018-01-01")["Close"].to_numpy()/2)
+
+    df = load_price_data("X", "2015-01-01", "2018-01-01", fetcher=fetcher, cache_dir=tmp_path)
+    np.testing.assert_array_equal(df["Close"].to_numpy(), expected("2015-01-01", "2018-01-01")["Close"].to_numpy()/2)
+    assert fetcher.calls[-1] == ("2015-01-01", "2018-01-01") #the whole cached range is downloaded again, once
+
+
+def test_unchanged_history_is_extended(tmp_path):
+    fetcher = Fetcher()
+    load_price_data("X", "2015-01-01", "2017-01-01", fetcher=fetcher, cache_dir=tmp_path)
+    load_price_data("X", "2015-01-01", "2018-01-01", fetcher=fetcher, cache_dir=tmp_path)
+
+    assert fetcher.calls == [("2015-01-01", "2017-01-01"), ("2016-12-30", "2018-01-01")]
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from dca_simulator.metrics import irr_batch
+
+npf = pytest.importorskip("numpy_financial")
+
+
+@pytest.mark.parametrize("cashflows", [
+    [-100, 110],
+    [-100, -5, 300],
+    [-100, 250, -154], #two roots (10% and 40%), both ends of the search range have the same sign
+    [-100, 1e6], #rate far above 100% per period
+    [-100, 50, 50, 0.001]
+])
+def test_matches_numpy_financial(cashflows):
+    rates, converged = irr_batch(cashflows)
+
+    assert converged[0]
+    assert rates[0] == pytest.approx(npf.irr(cashflows), rel=1e-10)
+
+
+def test_rows_without_root_are_nan():
+    rates, converged = irr_batch([[100, 50], [-100, 0], [0, 0]])
+
+    assert np.isnan(rates).all()
+    assert not converged.any()
+
+
+def test_dca_cashflows_match_numpy_financial():
+    rng = np.random.default_rng(0)
+    cashflows = -rng.uniform(50, 150, (200, 300))
+    cashflows[:, -1] += rng.uniform(1e3, 1e5, 200)
+
+    rates, converged = irr_batch(cashflows)
+
+    assert converged.all()
+    np.testing.assert_allclose(rates[:20], [npf.irr(row) for row in cashflows[:20]], rtol=1e-10)
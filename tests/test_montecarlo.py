@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+from dca_simulator.data_loader import AAPL_CSV
+from dca_simulator.data_processing import data_process
+from dca_simulator.montecarlo import simulate, summarize
+from dca_simulator.strategies import dca_DD, lump_sum
+
+
+@pytest.fixture(scope="module")
+def prices():
+    return data_process(pd.read_csv(AAPL_CSV, index_col="Date", parse_dates=True)).loc["2015":]
+
+
+def test_every_config_of_a_grid_runs(prices):
+    grid = {"monthly_contrib": [100, 200], "DD_threshold": [0.1, 0.3]}
+    results = simulate(prices, {dca_DD: grid, lump_sum: {"monthly_contrib": 100}}, n_paths=10, seed=1, chunk_size=4)
+
+    assert len(results) == 10*5
+    assert results.groupby(["Strategy", "Config"]).size().tolist() == [10]*5
+    dd = results[results["Strategy"] == "dca_DD"]
+    assert set(zip(dd["monthly_contrib"], dd["DD_threshold"])) == {(100, 0.1), (100, 0.3), (200, 0.1), (200, 0.3)}
+    assert len(summarize(results)) == 5*3
+
+
+def test_config_matches_a_run_of_its_own(prices):
+    results = simulate(prices, {dca_DD: [{"monthly_contrib": 100}, {"monthly_contrib": 200, "DD_threshold": 0.3}]},
+                       n_paths=10, seed=1, chunk_size=4)
+    alone = simulate(prices, {dca_DD: {"monthly_contrib": 200, "DD_threshold": 0.3}}, n_paths=10, seed=1, chunk_size=4)
+
+    second = results[results["monthly_contrib"] == 200].reset_index(drop=True)
+    pd.testing.assert_frame_equal(second, alone)
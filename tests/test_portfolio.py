@@ -0,0 +1,26 @@
+import pytest
+
+from dca_simulator.portfolio import parse_weights
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("SPY:60, AGG:40", {"SPY": 0.6, "AGG": 0.4}),
+    ("spy:0.6,agg:0.4,", {"SPY": 0.6, "AGG": 0.4}),
+    ("AAPL:1", {"AAPL": 1.0}),
+    ("", {})
+])
+def test_parse_weights(text, expected):
+    assert parse_weights(text) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("text, message", [
+    ("SPY", "use TICKER:weight"),
+    (":40", "use TICKER:weight"),
+    ("AAPL:60, AAPL:40", "listed twice"),
+    ("SPY:sixty", "Invalid weight"),
+    ("SPY:-10, AGG:110", "non-negative"),
+    ("SPY:0, AGG:0", "positive sum")
+])
+def test_parse_weights_rejects(text, message):
+    with pytest.raises(ValueError, match=message):
+        parse_weights(text)
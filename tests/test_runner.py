@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from dca_simulator.metrics import compute_metrics
+from dca_simulator.runner import run_universe
+from dca_simulator.strategies import dca_standard, dca_DD, value_averaging
+
+STRATEGIES = {"DCA": (dca_standard, {"monthly_contrib": 150}),
+              "DD": (dca_DD, {"monthly_contrib": 150, "DD_threshold": 0.15}),
+              "VA": (value_averaging, {"goal_monthly_growth": 0.006, "monthly_contrib": 150})}
+
+
+def synthetic_panel(n_tickers=4, n_days=1500, seed=0):
+    """Random walks on business days, the last ticker starts trading late (leading NaNs)"""
+
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2015-01-01", periods=n_days, name="Date")
+    prices = 50*np.exp(np.cumsum(rng.normal(0.0003, 0.02, (n_days, n_tickers)), axis=0))
+    panel = pd.DataFrame(prices, index=dates, columns=[f"T{i}" for i in range(n_tickers)])
+    panel.iloc[:400, -1] = np.nan
+    return panel
+
+
+def test_parallel_matches_serial():
+    panel = synthetic_panel()
+
+    serial = run_universe(panel, STRATEGIES, workers=1)
+    parallel = run_universe(panel, STRATEGIES, workers=2)
+
+    assert "Error" not in serial.columns
+    assert len(serial) == panel.shape[1]*len(STRATEGIES)
+    pd.testing.assert_frame_equal(serial, parallel)
+
+
+def test_leading_nans_are_dropped():
+    panel = synthetic_panel()
+    late = panel.columns[-1]
+
+    results = run_universe(panel, {"DCA": STRATEGIES["DCA"]}, workers=1)
+    expected = compute_metrics(dca_standard(panel[[late]].dropna().rename(columns={late: "Close"}), monthly_contrib=150))
+
+    assert results.loc[(late, "DCA")].to_dict() == expected
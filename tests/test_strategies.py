@@ -0,0 +1,124 @@
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+
+from dca_simulator.backtest import sweep
+from dca_simulator.data_loader import AAPL_CSV
+from dca_simulator.data_processing import data_process
+from dca_simulator.metrics import compute_metrics
+from dca_simulator.scheduler import sample
+from dca_simulator.strategies import dca_DD, dca_sma_mean_rev, dca_sma_mom, dca_standard, lump_sum, value_averaging
+
+
+@pytest.fixture(scope="module")
+def prices():
+    return data_process(pd.read_csv(AAPL_CSV, index_col="Date", parse_dates=True))
+
+
+def reference(df, monthly_contrib, amount):
+    """The original month by month loop of the DCA strategies, amount(row) is the multiple of monthly_contrib invested"""
+
+    monthly_investments = df.resample("MS").first()
+
+    shares_total = 0
+    invested_total = 0
+
+    for date, row in monthly_investments.iterrows():
+        investment_amount = monthly_contrib*amount(row)
+        if investment_amount:
+            shares_total += investment_amount/row["Close"]
+            invested_total += investment_amount
+
+        monthly_investments.loc[date, "shares_total"] = shares_total
+        monthly_investments.loc[date, "invested_total"] = invested_total
+        monthly_investments.loc[date, "portf_value"] = shares_total*row["Close"]
+
+    monthly_investments["profit_loss"] = monthly_investments["portf_value"] - monthly_investments["invested_total"]
+    return monthly_investments
+
+
+def with_DD(df, DD_threshold):
+    df = df.copy()
+    df["12m_high"] = df["Close"].rolling(252).max()
+    df["drawdown"] = df["Close"]/df["12m_high"]
+    df["DD_cond"] = df["drawdown"] <= (1-DD_threshold)
+    return df
+
+
+def with_sma(df, sma_period, above):
+    df = df.copy()
+    df["sma"] = df["Close"].rolling(sma_period).mean()
+    df["above_sma"] = df["Close"] > df["sma"] if above else df["Close"] < df["sma"]
+    return df
+
+
+@pytest.mark.parametrize("period", [slice(None), slice("2010-01-13", "2015")])
+def test_strategies_match_the_original_loops(prices, period):
+    df = prices.loc[period]
+
+    expected = {
+        "dca_standard": reference(df, 150, lambda row: 1),
+        "dca_DD": reference(with_DD(df, 0.15), 150, lambda row: 2 if row["DD_cond"] else 1),
+        "dca_sma_mom": reference(with_sma(df, 90, above=True), 150, lambda row: row["above_sma"] == True),
+        "dca_sma_mean_rev": reference(with_sma(df, 50, above=False), 150, lambda row: row["above_sma"] == True)
+    }
+    results = {
+        "dca_standard": dca_standard(df, 150),
+        "dca_DD": dca_DD(df, 150, 0.15),
+        "dca_sma_mom": dca_sma_mom(df, 150, 90),
+        "dca_sma_mean_rev": dca_sma_mean_rev(df, 150, 50)
+    }
+
+    for name, result in results.items():
+        pd.testing.assert_frame_equal(result, expected[name], check_exact=True, obj=name)
+
+
+@pytest.mark.parametrize("frictions", [None, {"fee_fixed": 1.0, "whole_shares": True, "cash_rate": 0.02}])
+def test_sweep_rows_match_compute_metrics(prices, frictions):
+    grids = {
+        dca_standard: {"monthly_contrib": [100, 150]},
+        dca_DD: {"monthly_contrib": [100, 150], "DD_threshold": [0.1, 0.2]},
+        lump_sum: {"monthly_contrib": 100},
+        dca_sma_mom: {"monthly_contrib": 150, "sma_period": [3, 90]},
+        dca_sma_mean_rev: [{"monthly_contrib": 150, "sma_period": 50}, {"monthly_contrib": 100, "sma_period": 200}],
+        value_averaging: {"monthly_contrib": 150, "goal_monthly_growth": [0.006, 0.01]}
+    }
+    table = sweep(prices, grids, frictions=frictions)
+
+    expected = []
+    for strategy, params in grids.items():
+        configs = params if isinstance(params, list) else [dict(zip(params, combo)) for combo in
+                                                          itertools.product(*(np.atleast_1d(v) for v in params.values()))]
+        expected += [compute_metrics(strategy(prices, **config, frictions=frictions)) for config in configs]
+
+    expected = pd.DataFrame(expected)
+    pd.testing.assert_frame_equal(table[expected.columns].astype(float), expected, check_exact=True)
+
+
+@pytest.mark.parametrize("period", [slice(None), slice("2010-01-13", "2015")])
+def test_default_schedule_is_the_monthly_resample(prices, period):
+    df = with_sma(with_DD(prices.loc[period], 0.15), 90, above=True) #NaN and bool columns as well
+
+    expected = df.resample("MS").first()
+    pd.testing.assert_frame_equal(sample(df), expected, check_exact=True)
+    pd.testing.assert_frame_equal(sample(df, "monthly"), expected, check_exact=True)
+    for strategy in (dca_standard, dca_DD, lump_sum, dca_sma_mom, dca_sma_mean_rev, value_averaging):
+        pd.testing.assert_frame_equal(strategy(df[["Close"]], monthly_contrib=150, schedule="monthly"),
+                                      strategy(df[["Close"]], monthly_contrib=150), check_exact=True)
+
+
+@pytest.mark.parametrize("strategy,kwargs", [
+    (dca_standard, {"monthly_contrib": 150}),
+    (dca_DD, {"monthly_contrib": 150, "DD_threshold": 0.15}),
+    (lump_sum, {"monthly_contrib": 150}),
+    (dca_sma_mom, {"monthly_contrib": 150, "sma_period": 90}),
+    (dca_sma_mean_rev, {"monthly_contrib": 150, "sma_period": 50}),
+    (value_averaging, {"goal_monthly_growth": 0.006, "monthly_contrib": 150})
+], ids=lambda case: getattr(case, "__name__", None))
+def test_no_frictions_gives_the_frictionless_frame(prices, strategy, kwargs):
+    expected = strategy(prices, **kwargs)
+    result = strategy(prices, **kwargs, frictions={})
+
+    pd.testing.assert_frame_equal(result[expected.columns], expected, check_exact=True)
+    assert (result["cash"] == 0).all() and (result["fees_total"] == 0).all()
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dca_simulator.data_loader import AAPL_CSV
+from dca_simulator.data_processing import data_process
+from dca_simulator.streaming import StreamingBacktest, merge_rows
+from dca_simulator.strategies import dca_DD, dca_sma_mean_rev, dca_sma_mom, dca_standard, lump_sum, value_averaging
+
+
+@pytest.fixture(scope="module")
+def prices():
+    return data_process(pd.read_csv(AAPL_CSV, index_col="Date", parse_dates=True))
+
+
+CASES = [
+    (dca_standard, dict(monthly_contrib=150)),
+    (dca_DD, dict(monthly_contrib=150, DD_threshold=0.15)),
+    (dca_sma_mom, dict(monthly_contrib=150, sma_period=90)),
+    (dca_sma_mom, dict(monthly_contrib=150, sma_period=1)),
+    (dca_sma_mean_rev, dict(monthly_contrib=150, sma_period=50)),
+    (dca_sma_mean_rev, dict(monthly_contrib=150, sma_period=3)),
+    (value_averaging, dict(goal_monthly_growth=0.006, monthly_contrib=150)),
+]
+
+
+def replay(df, strategy, kwargs, path, seed=0):
+    """Feeds df in random overlapping chunks, saving and loading the state between two chunks"""
+
+    rng = np.random.default_rng(seed)
+    stream = StreamingBacktest(strategy, **kwargs)
+    rows = pd.DataFrame()
+    i = 0
+    while i < len(df):
+        j = i + int(rng.integers(1, 400))
+        rows = merge_rows(rows, stream.update(df.iloc[max(0, i-3):j]))
+        stream.save(path)
+        stream = StreamingBacktest.load(path)
+        i = j
+    return rows
+
+
+@pytest.mark.parametrize("strategy,kwargs", CASES, ids=lambda case: getattr(case, "__name__", None))
+def test_chunked_stream_matches_the_strategy(prices, tmp_path, strategy, kwargs):
+    rows = replay(prices, strategy, kwargs, tmp_path / "state.json")
+    pd.testing.assert_frame_equal(rows, strategy(prices, **kwargs)[rows.columns], check_exact=True, check_freq=False)
+
+
+def test_goal_schedule_stream_matches_the_strategy(prices, tmp_path):
+    df = prices.loc["2010-01-13":"2015"]
+    goals = np.linspace(100, 90000, len(df.resample("MS").first()))
+    rows = replay(df, value_averaging, dict(monthly_contrib=150, goal_schedule=goals), tmp_path / "state.json")
+    expected = value_averaging(df, monthly_contrib=150, goal_schedule=goals)[rows.columns]
+    pd.testing.assert_frame_equal(rows, expected, check_exact=True, check_freq=False)
+
+
+def test_lump_sum_is_not_supported():
+    with pytest.raises(ValueError, match="lump_sum"):
+        StreamingBacktest(lump_sum, monthly_contrib=100)
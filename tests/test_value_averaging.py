@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dca_simulator.data_loader import AAPL_CSV
+from dca_simulator.data_processing import data_process
+from dca_simulator.engine import _jit, _va_loop, _va_numpy, value_averaging_contributions, value_averaging_goals
+from dca_simulator.strategies import value_averaging
+
+
+@pytest.fixture(scope="module")
+def prices():
+    return data_process(pd.read_csv(AAPL_CSV, index_col="Date", parse_dates=True))
+
+
+def reference(df, goal_monthly_growth=0.006, monthly_contrib=1000, goal_schedule=None):
+    """The original month by month value_averaging loop"""
+
+    monthly_investments = df.resample("MS").first()
+
+    shares_total = 0
+    invested_total = 0
+
+    for i, (date, row) in enumerate(monthly_investments.iterrows()):
+        if goal_schedule is None:
+            goal_val = monthly_contrib*(1+i)*(1+goal_monthly_growth)**i
+        else:
+            goal_val = goal_schedule[i]
+        current_val = shares_total * row["Close"]
+
+        investment_this_month = max(goal_val - current_val, 0)
+
+        if investment_this_month > 0:
+            shares_bought = investment_this_month / row["Close"]
+            shares_total += shares_bought
+            invested_total += investment_this_month
+
+        monthly_investments.loc[date, "shares_total"] = shares_total
+        monthly_investments.loc[date, "invested_total"] = invested_total
+        monthly_investments.loc[date, "portf_value"] = shares_total*row["Close"]
+
+    monthly_investments["profit_loss"] = monthly_investments["portf_value"] - monthly_investments["invested_total"]
+    return monthly_investments
+
+
+@pytest.mark.parametrize("growth, contrib", [(0.006, 150), (0.035, 150), (0.0, 1000), (-0.01, 500)])
+def test_matches_original_recurrence(prices, growth, contrib):
+    result = value_averaging(prices, growth, contrib)
+    expected = reference(prices, growth, contrib)
+
+    pd.testing.assert_frame_equal(result[expected.columns], expected, rtol=1e-12, check_freq=False)
+
+
+def test_goal_schedule(prices):
+    n = len(prices.resample("MS").first())
+    goals = np.linspace(100, 90000, n)
+
+    result = value_averaging(prices, monthly_contrib=150, goal_schedule=goals)
+    expected = reference(prices, goal_schedule=goals)
+    pd.testing.assert_frame_equal(result[expected.columns], expected, rtol=1e-12, check_freq=False)
+
+    formula = value_averaging_goals(n, 0.006, 150)[0]
+    pd.testing.assert_frame_equal(value_averaging(prices, monthly_contrib=150, goal_schedule=formula),
+                                  value_averaging(prices, 0.006, 150), rtol=1e-12)
+
+
+def test_compiled_loop_matches_numpy():
+    compiled = _jit("va", _va_loop)
+    if compiled is None:
+        pytest.skip("numba is not installed")
+
+    rng = np.random.default_rng(0)
+    close = 100*np.exp(np.cumsum(rng.normal(0.005, 0.08, (20, 300)), axis=1))
+    goal = value_averaging_goals(300, rng.uniform(-0.01, 0.04, 20), rng.uniform(50, 2000, 20))
+
+    np.testing.assert_allclose(compiled(close, goal), _va_numpy(close, goal), rtol=1e-12, atol=0)
+    np.testing.assert_array_equal(_va_loop(close, goal), _va_numpy(close, goal)) #same operations in the same order
+
+
+def test_many_configs_match_single_runs(prices):
+    close = prices.resample("MS").first()["Close"].to_numpy()
+    growths = np.array([0.0, 0.006, 0.02, 0.035])
+    contribs = np.array([100.0, 150.0, 1000.0, 2500.0])
+
+    batch = value_averaging_contributions(close, growths, contribs)
+    assert batch.shape == (len(growths), len(close))
+    for row, growth, contrib in zip(batch, growths, contribs):
+        np.testing.assert_array_equal(row, value_averaging_contributions(close, growth, contrib)[0])
+
+    paths = np.vstack([close, close*1.5, close[::-1]]) #one row of prices per config
+    batch = value_averaging_contributions(paths, 0.006, 150)
+    for row, path in zip(batch, paths):
+        np.testing.assert_array_equal(row, value_averaging_contributions(path, 0.006, 150)[0])
+
+
+@pytest.mark.parametrize("frictions", [{"fee_fixed": 5, "fee_pct": 0.01}, {"fee_fixed": 5, "fee_pct": 0.01, "whole_shares": True}])
+def test_frictions_top_up_for_fees(prices, frictions):
+    frictionless = value_averaging(prices)
+    result = value_averaging(prices, frictions=frictions)
+    goal = value_averaging_goals(len(result), 0.006, 1000)[0]
+
+    assert result["invested_total"].iloc[-1] > frictionless["invested_total"].iloc[-1]
+    assert (result["portf_value"] >= 0.99*goal).all()
+
+
+def test_zero_frictions_match_frictionless(prices):
+    frictionless = value_averaging(prices, 0.006, 150)
+    result = value_averaging(prices, 0.006, 150, frictions={})
+
+    pd.testing.assert_frame_equal(result[frictionless.columns], frictionless, check_exact=True)